@@ -0,0 +1,546 @@
+"""Бенчмарки калькулятора из colc.py.
+
+Запуск: python bench_colc.py [имя ...]
+Без аргументов выполняются все бенчмарки.
+
+Бенчмарк pipeline измеряет отдельно разбор, вычисление и вывод словами на
+воспроизводимом корпусе и умеет сравнивать результат с сохраненным JSON:
+    python bench_colc.py pipeline --save-baseline baseline.json
+    python bench_colc.py pipeline --baseline baseline.json
+Медианы импорта и первого вызова из бенчмарка startup попадают в тот же
+файл, и при сравнении рост времени запуска тоже считается регрессией:
+    python bench_colc.py startup pipeline --baseline baseline.json
+
+Бенчмарк stream сравнивает время и пик памяти вычисления очень длинного
+выражения целиком и потоком: python bench_colc.py stream --terms 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+from colc import AdvancedDecimalCalculator
+
+
+def legacy_parse_expression(calculator, expression):
+    """Прежний разбор: замена операций через str.replace, re.findall
+    и повторное разбиение каждой числовой фразы"""
+    expression = expression.lower()
+    for text_op, symbol in sorted(calculator.operations.items(), key=lambda x: -len(x[0])):
+        expression = expression.replace(text_op, f" {symbol} ")
+
+    tokens = re.findall(r'[-+]?\d*\.?\d+|[+\-*/%()]|[а-я]+', expression)
+    tokens = [token.strip() for token in tokens if token.strip()]
+
+    parsed_tokens = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] in '+-*/%()':
+            parsed_tokens.append(tokens[i])
+            i += 1
+            continue
+        number_parts = []
+        while i < len(tokens) and tokens[i] not in '+-*/%()':
+            number_parts.append(tokens[i])
+            i += 1
+        parsed_tokens.append(calculator.text_to_number(' '.join(number_parts)))
+    return parsed_tokens
+
+
+def legacy_integer_to_text(calculator, number):
+    """Прежний вывод целого числа: линейный поиск по словарям сотен
+    и десятков и словарь единиц, создаваемый на каждом вызове"""
+    def simple(number, for_thousands=False):
+        result = []
+        hundreds = number // 100
+        if hundreds > 0:
+            for key, value in calculator.hundreds.items():
+                if value == hundreds * 100:
+                    result.append(key)
+                    break
+        remainder = number % 100
+        if remainder > 0:
+            if remainder < 20:
+                units_part, tens_part = remainder, 0
+            else:
+                tens_part, units_part = (remainder // 10) * 10, remainder % 10
+            for key, value in calculator.tens.items():
+                if value == tens_part:
+                    result.append(key)
+                    break
+            if units_part > 0:
+                if for_thousands and units_part in [1, 2]:
+                    result.append('одна' if units_part == 1 else 'две')
+                else:
+                    forms = {value: key for key, value in calculator.units.items()
+                             if key not in ('одна', 'две')}
+                    result.append(forms[units_part])
+        return ' '.join(result)
+
+    result = []
+    millions = number // 1000000
+    if millions > 0:
+        result.append(simple(millions))
+        result.append('миллион')
+        number %= 1000000
+    thousands = number // 1000
+    if thousands > 0:
+        result.append(simple(thousands, True))
+        result.append('тысяча')
+        number %= 1000
+    if number > 0:
+        result.append(simple(number))
+    return ' '.join(result)
+
+
+def random_number_text(rng, calculator):
+    """Случайное число словами"""
+    return calculator.number_to_text(rng.randint(1, 999999))
+
+
+def random_expression(rng, calculator, terms):
+    """Случайное выражение из terms чисел"""
+    words = [random_number_text(rng, calculator)]
+    for _ in range(terms - 1):
+        words.append(rng.choice(['плюс', 'минус', 'умножить на', 'разделить на']))
+        words.append(random_number_text(rng, calculator))
+    return ' '.join(words)
+
+
+def report(name, seconds, count):
+    print(f"{name:<40} {seconds / count * 1e6:12.1f} мкс/вызов")
+
+
+def bench_lexer(args):
+    """Однопроходный лексер против прежнего str.replace-разбора"""
+    rng = random.Random(args.seed)
+    calculator = AdvancedDecimalCalculator()
+    for terms in (3, 30, 300):
+        expression = random_expression(rng, calculator, terms)
+        repeat = max(1, 3000 // terms)
+        legacy = timeit.timeit(
+            lambda: legacy_parse_expression(calculator, expression), number=repeat)
+        lexer = timeit.timeit(
+            lambda: calculator.parse_expression(expression), number=repeat)
+        report(f"legacy parse, {terms} чисел", legacy, repeat)
+        report(f"lexer parse, {terms} чисел", lexer, repeat)
+        print(f"{'ускорение':<40} {legacy / lexer:12.2f}x")
+
+
+def bench_triads(args):
+    """Вывод миллиона случайных целых чисел через таблицы групп"""
+    rng = random.Random(args.seed)
+    calculator = AdvancedDecimalCalculator()
+    numbers = [rng.randrange(1, 10 ** 9) for _ in range(args.count)]
+
+    start = time.perf_counter()
+    for number in numbers:
+        legacy_integer_to_text(calculator, number)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for number in numbers:
+        calculator._integer_to_text(number)
+    tables = time.perf_counter() - start
+
+    report(f"legacy integer_to_text, {args.count} чисел", legacy, args.count)
+    report(f"table integer_to_text, {args.count} чисел", tables, args.count)
+    print(f"{'ускорение':<40} {legacy / tables:12.2f}x")
+
+
+def legacy_split_triads(number):
+    """Прежнее деление на группы: многократное деление на 1000"""
+    groups = []
+    while number:
+        number, triad = divmod(number, 1000)
+        groups.append(triad)
+    groups.reverse()
+    return groups
+
+
+def bench_magnitude(args):
+    """Деление больших чисел на группы и их вывод словами"""
+    rng = random.Random(args.seed)
+    calculator = AdvancedDecimalCalculator()
+    for digits in (1000, 10000, 100000):
+        number = rng.randrange(10 ** (digits - 1), 10 ** digits)
+        repeat = max(1, 100000 // digits)
+        legacy = timeit.timeit(lambda: legacy_split_triads(number), number=repeat)
+        split = timeit.timeit(lambda: calculator._split_triads(number), number=repeat)
+        render = timeit.timeit(lambda: calculator._integer_to_text(number), number=repeat)
+        report(f"legacy split, {digits} цифр", legacy, repeat)
+        report(f"divide-and-conquer split, {digits} цифр", split, repeat)
+        report(f"integer_to_text, {digits} цифр", render, repeat)
+
+
+def stream_chunks(seed, terms, chunk_size=1 << 16):
+    """Выражение из terms чисел кусками по chunk_size символов; каждое
+    десятое слагаемое - произведение в скобках. Текст целиком не хранится"""
+    rng = random.Random(seed)
+    calculator = AdvancedDecimalCalculator()
+    numbers = [random_number_text(rng, calculator) for _ in range(1000)]
+    buffer = [rng.choice(numbers)]
+    size = len(buffer[0])
+    for term in range(1, terms):
+        if term % 10:
+            piece = f" {rng.choice(('плюс', 'минус'))} {rng.choice(numbers)}"
+        else:
+            piece = (f" плюс ({rng.choice(numbers)} умножить на {rng.choice(numbers)}"
+                     f" разделить на {rng.choice(numbers)})")
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    yield ''.join(buffer)
+
+
+def measure_memory(function):
+    """Время и пик выделенной памяти (tracemalloc, отдельный прогон)"""
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def bench_stream(args):
+    """Вычисление выражения из --terms чисел: целиком в памяти и потоком"""
+    calculator = AdvancedDecimalCalculator()
+    text = ''.join(stream_chunks(args.seed, args.terms))
+
+    variants = (
+        ('программа целиком', lambda: calculator.execute(
+            calculator.to_postfix(calculator.parse_expression(text)))),
+        ('поток из строки', lambda: calculator.evaluate_stream(text)),
+        ('поток из кусков', lambda: calculator.evaluate_stream(
+            stream_chunks(args.seed, args.terms))),
+    )
+    print(f"{args.terms} чисел, {len(text) / 2 ** 20:.1f} млн символов")
+    print(f"{'вариант':<24} {'секунд':>10} {'пик МиБ':>10}")
+    results = set()
+    for name, function in variants:
+        result, seconds, peak = measure_memory(function)
+        results.add(result)
+        print(f"{name:<24} {seconds:10.2f} {peak / 2 ** 20:10.1f}")
+    if len(results) != 1:
+        print("внимание: результаты вариантов различаются")
+        return 1
+    return 0
+
+
+async def load_client(port, expressions, window, latencies):
+    """Клиент нагрузки: держит до window запросов без ответа"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    sent = {}
+    pending = asyncio.Semaphore(window)
+
+    async def receive():
+        for _ in expressions:
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent.pop(response['id']))
+            pending.release()
+
+    receiver = asyncio.create_task(receive())
+    for number, expression in enumerate(expressions):
+        await pending.acquire()
+        sent[number] = time.perf_counter()
+        writer.write(json.dumps({'id': number, 'expression': expression},
+                                ensure_ascii=False).encode() + b'\n')
+        await writer.drain()
+    await receiver
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_server_load(args, expressions):
+    from colc_server import CalculatorServer
+
+    server = CalculatorServer(processes=args.processes)
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    latencies = []
+    per_client = len(expressions) // args.clients
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        load_client(port, expressions[i * per_client:(i + 1) * per_client],
+                    args.window, latencies)
+        for i in range(args.clients)))
+    seconds = time.perf_counter() - start
+    stats = server.stats.snapshot()
+    await server.close()
+    return latencies, seconds, stats
+
+
+def bench_server(args):
+    """Нагрузка на colc_server: --clients соединений по --window запросов"""
+    rng = random.Random(args.seed)
+    calculator = AdvancedDecimalCalculator()
+    expressions = [random_expression(rng, calculator, rng.randint(1, 5))
+                   for _ in range(args.requests)]
+    latencies, seconds, stats = asyncio.run(run_server_load(args, expressions))
+    latencies.sort()
+    print(f"{len(latencies)} запросов за {seconds:.2f} с: {len(latencies) / seconds:.0f} запросов/с")
+    for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+        value = latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+        print(f"{name:<40} {value * 1e3:12.2f} мс")
+    print(f"{'пачек, средний размер':<40} {stats['batches']:>6} {stats['mean_batch']:5.1f}")
+
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import colc
+imported = time.perf_counter()
+colc.calc('сто двадцать три умножить на четыре')
+called = time.perf_counter()
+print(imported - start, called - imported)
+"""
+
+
+def bench_startup(args):
+    """Время импорта colc и первого вызова calc в новом процессе"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    imports, calls, totals = [], [], []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT], cwd=directory,
+            check=True, capture_output=True, text=True).stdout
+        totals.append(time.perf_counter() - start)
+        imported, called = map(float, output.split())
+        imports.append(imported)
+        calls.append(called)
+
+    stages = {}
+    for name, stage, samples in (('import colc', 'import', imports),
+                                 ('первый calc', 'first_calc', calls),
+                                 ('процесс целиком', 'process', totals)):
+        median = statistics.median(samples)
+        stages[stage] = {'p50_us': median * 1e6}
+        print(f"{name:<40} {median * 1e3:12.2f} мс (медиана)")
+    # Медианы запуска сохраняются и сравниваются вместе с pipeline
+    return record_baseline(args, {'startup': stages})
+
+
+PRIMES = (3, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 97)
+
+
+def corpus_short(rng, calculator):
+    return random_expression(rng, calculator, rng.randint(1, 3))
+
+
+def corpus_long(rng, calculator):
+    return random_expression(rng, calculator, rng.randint(40, 60))
+
+
+def corpus_nested(rng, calculator):
+    """Выражение с глубокой вложенностью скобок"""
+    expression = random_number_text(rng, calculator)
+    for _ in range(rng.randint(20, 40)):
+        operation = rng.choice(['плюс', 'минус', 'умножить на'])
+        expression = f"( {expression} ) {operation} {calculator._integer_to_text(rng.randint(1, 9))}"
+    return expression
+
+
+def corpus_periodic(rng, calculator):
+    """Деление на простое число: результат - периодическая дробь"""
+    numerator = random_number_text(rng, calculator)
+    return f"{numerator} разделить на {calculator._integer_to_text(rng.choice(PRIMES))}"
+
+
+def corpus_large(rng, calculator):
+    """Произведение больших чисел (до дециллионов)"""
+    factors = [calculator._integer_to_text(rng.randrange(10 ** 20, 10 ** 35))
+               for _ in range(rng.randint(2, 5))]
+    return ' умножить на '.join(factors)
+
+
+CORPUS = {
+    'short': corpus_short,
+    'long': corpus_long,
+    'nested': corpus_nested,
+    'periodic': corpus_periodic,
+    'large': corpus_large,
+}
+
+
+def generate_corpus(seed, size):
+    """Воспроизводимый корпус: по size выражений каждого вида"""
+    rng = random.Random(seed)
+    calculator = AdvancedDecimalCalculator()
+    return {name: [generate(rng, calculator) for _ in range(size)]
+            for name, generate in CORPUS.items()}
+
+
+def measure_stages(calculator, expressions, repeat):
+    """Время каждого этапа для каждого выражения, в наносекундах"""
+    timings = {'parse': [], 'evaluate': [], 'render': []}
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for expression in expressions:
+            start = clock()
+            program = calculator.to_postfix(calculator.parse_expression(expression))
+            parsed = clock()
+            result = calculator.execute(program)
+            evaluated = clock()
+            calculator.number_to_text(result)
+            rendered = clock()
+            timings['parse'].append(parsed - start)
+            timings['evaluate'].append(evaluated - parsed)
+            timings['render'].append(rendered - evaluated)
+    return timings
+
+
+def summarize(samples):
+    """Пропускная способность и перцентили задержки одного этапа"""
+    if len(samples) < 2:
+        # quantiles нужно хотя бы два замера; у одного все перцентили равны ему
+        cuts = samples * 99
+    else:
+        cuts = statistics.quantiles(samples, n=100)
+    return {
+        'throughput': len(samples) / (sum(samples) / 1e9),
+        'p50_us': cuts[49] / 1e3,
+        'p90_us': cuts[89] / 1e3,
+        'p99_us': cuts[98] / 1e3,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Печатает отношение к базовой линии; возвращает число регрессий"""
+    regressions = 0
+    print(f"{'корпус/этап':<24} {'p50 сейчас':>12} {'p50 база':>12} {'отношение':>10}")
+    for corpus, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(corpus, {}).get(stage)
+            if base is None:
+                continue
+            ratio = current['p50_us'] / base['p50_us']
+            mark = ''
+            if ratio > 1 + threshold:
+                mark = '  <- регрессия'
+                regressions += 1
+            print(f"{corpus + '/' + stage:<24} {current['p50_us']:12.1f} "
+                  f"{base['p50_us']:12.1f} {ratio:10.2f}{mark}")
+    return regressions
+
+
+def bench_pipeline(args):
+    """Пропускная способность и задержки этапов на корпусе выражений"""
+    corpus = generate_corpus(args.seed, args.corpus_size)
+    calculator = AdvancedDecimalCalculator(exact=args.exact)
+
+    results = {}
+    print(f"{'корпус/этап':<24} {'оп/с':>12} {'p50 мкс':>10} {'p90 мкс':>10} {'p99 мкс':>10}")
+    for name, expressions in corpus.items():
+        timings = measure_stages(calculator, expressions, args.repeat)
+        results[name] = {stage: summarize(samples) for stage, samples in timings.items()}
+        for stage, summary in results[name].items():
+            print(f"{name + '/' + stage:<24} {summary['throughput']:12.0f} "
+                  f"{summary['p50_us']:10.1f} {summary['p90_us']:10.1f} {summary['p99_us']:10.1f}")
+
+    return record_baseline(args, results, seed=args.seed, corpus_size=args.corpus_size,
+                           exact=args.exact)
+
+
+def record_baseline(args, results, **corpus):
+    """Сохраняет результаты в --save-baseline и сравнивает с --baseline.
+
+    Бенчмарки пишут в один файл свои группы результатов (корпуса pipeline,
+    startup), не затирая чужие. corpus - параметры корпуса pipeline.
+    Возвращает 1, если есть регрессии.
+    """
+    if args.save_baseline:
+        saved = {'results': {}}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, encoding='utf-8') as file:
+                saved = json.load(file)
+        saved.update(corpus)
+        saved['results'].update(results)
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(saved, file, ensure_ascii=False, indent=2)
+        print(f"базовая линия сохранена в {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if corpus and (baseline.get('seed'), baseline.get('corpus_size')) != (
+                corpus['seed'], corpus['corpus_size']):
+            print("внимание: базовая линия снята на другом корпусе")
+        if compare(results, baseline['results'], args.threshold):
+            return 1
+    return 0
+
+
+BENCHMARKS = {
+    'lexer': bench_lexer,
+    'triads': bench_triads,
+    'magnitude': bench_magnitude,
+    'startup': bench_startup,
+    'pipeline': bench_pipeline,
+    'stream': bench_stream,
+    'server': bench_server,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('names', nargs='*',
+                        help="какие бенчмарки запускать: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('--count', type=int, default=1000000,
+                        help="сколько чисел выводить в бенчмарке triads")
+    parser.add_argument('--runs', type=int, default=20,
+                        help="сколько процессов запускать в бенчмарке startup")
+    parser.add_argument('--terms', type=int, default=1000000,
+                        help="сколько чисел в выражении бенчмарка stream")
+    parser.add_argument('--requests', type=int, default=20000,
+                        help="сколько запросов отправить в бенчмарке server")
+    parser.add_argument('--clients', type=int, default=16,
+                        help="число соединений в бенчмарке server")
+    parser.add_argument('--window', type=int, default=32,
+                        help="запросов без ответа на соединение в бенчмарке server")
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help="процессов пула сервера в бенчмарке server")
+    parser.add_argument('--corpus-size', type=int, default=200,
+                        help="сколько выражений каждого вида в корпусе pipeline")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="сколько раз прогонять корпус pipeline")
+    parser.add_argument('--exact', action='store_true',
+                        help="pipeline в точном режиме (Fraction)")
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help="сохранить результаты pipeline в JSON")
+    parser.add_argument('--baseline', metavar='PATH',
+                        help="сравнить pipeline с сохраненным JSON")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="допустимое замедление p50 относительно базы (доля)")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"неизвестные бенчмарки: {', '.join(sorted(unknown))}")
+    if args.corpus_size < 1 or args.repeat < 1:
+        parser.error("--corpus-size и --repeat должны быть положительными")
+
+    status = 0
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}")
+        status = BENCHMARKS[name](args) or status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
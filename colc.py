@@ -1,54 +1,806 @@
+import os
 import re
-from decimal import Decimal, getcontext
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from decimal import (
+    MAX_EMAX, MAX_PREC, MIN_EMIN, ROUND_DOWN, Context, Decimal, DecimalException)
 from fractions import Fraction
+from itertools import islice
+from operator import add, mul, sub, truediv
+from types import MappingProxyType
 
 
-class AdvancedDecimalCalculator:
+# Контекст без округления для точных операций над целыми (+, -, *)
+_EXACT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+# Сколько знаков дробной части проверяется на периодичность
+_FRACTION_DIGITS = Decimal('1e-20')
+
+
+class DivisionByZeroError(ValueError):
+    """Деление или остаток от деления на ноль"""
+
+
+def _fraction_remainder(left, right):
+    """Остаток со знаком делимого, как у Decimal"""
+    return left - right * int(left / right)
+
+
+def _checked(operation):
+    """Добавляет к делению проверку делителя на ноль"""
+    def checked(left, right):
+        if right == 0:
+            raise DivisionByZeroError("Деление на ноль")
+        return operation(left, right)
+    return checked
+
+
+# Оценки порядка результата по порядкам операндов (Decimal.adjusted)
+def _sum_order(left, right):
+    return max(left, right) + 2
+
+
+def _product_order(left, right):
+    return left + right + 2
+
+
+def _quotient_order(left, right):
+    return left - right + 1
+
+
+class Variable(str):
+    """Имя переменной в программе; отличается от строк-операторов типом"""
+    __slots__ = ()
+
+
+def _interpret(program, load, plus, minus, times, divide, remainder):
+    """Выполняет программу в постфиксной записи.
+
+    load превращает число или переменную программы в значение, остальные
+    аргументы - операции над значениями (числами или массивами).
+    """
+    values = []
+    for item in program:
+        if isinstance(item, (Decimal, Variable)):
+            values.append(load(item))
+            continue
+        right = values.pop()
+        left = values.pop()
+        if item == '+':
+            values.append(plus(left, right))
+        elif item == '-':
+            values.append(minus(left, right))
+        elif item == '*':
+            values.append(times(left, right))
+        elif item == '/':
+            values.append(divide(left, right))
+        elif item == '%':
+            values.append(remainder(left, right))
+
+    return values[0] if values else load(Decimal('0'))
+
+
+class CompiledExpression:
+    """Скомпилированное выражение в постфиксной записи"""
+    __slots__ = ('source', 'program', 'variables')
+
+    def __init__(self, source, program):
+        self.source = source
+        self.program = program
+        # Переменные в порядке первого появления
+        self.variables = tuple(dict.fromkeys(
+            item for item in program if isinstance(item, Variable)))
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+class ExpressionTemplate:
+    """Выражение с переменными, скомпилированное один раз для многих значений.
+
+    Вызов template(икс=1, игрек='два') вычисляет одно значение,
+    evaluate_array подставляет целые столбцы значений из массивов NumPy.
+    """
+
+    def __init__(self, calculator, compiled):
+        self.calculator = calculator
+        self.compiled = compiled
+
+    @property
+    def variables(self):
+        return self.compiled.variables
+
+    def __call__(self, **bindings):
+        return self.calculator.execute(self.compiled, bindings)
+
+    def evaluate_array(self, bindings, dtype=None):
+        """Вычисляет выражение поэлементно для массивов значений переменных.
+
+        dtype='float64' - быстрый путь на векторных операциях NumPy (деление
+        на ноль дает nan), dtype='object' - поэлементные вычисления в Decimal
+        (или Fraction в точном режиме) с контекстом калькулятора; там элемент,
+        для которого вычисление не удалось (деление на ноль, переполнение),
+        равен None, а остальные элементы столбца считаются как обычно.
+        По умолчанию быстрый путь выбирается для числовых массивов вне
+        точного режима. Форма результата - общая форма всех переданных
+        массивов, даже если выражение использует не все из них.
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Для вычислений над массивами нужен NumPy") from None
+
+        arrays = {}
+        for name in self.variables:
+            if name not in bindings:
+                raise ValueError(f"Не задано значение переменной {name}")
+            arrays[name] = numpy.asarray(bindings[name])
+
+        if dtype is None:
+            numeric = all(array.dtype.kind in 'biuf' for array in arrays.values())
+            dtype = 'float64' if numeric and not self.calculator.exact else 'object'
+        dtype = numpy.dtype(dtype)
+        if dtype == numpy.float64:
+            result = self._evaluate_float(numpy, arrays)
+        elif dtype == numpy.object_:
+            result = self._evaluate_objects(numpy, arrays)
+        else:
+            raise ValueError(f"Неподдерживаемый тип массива: {dtype}")
+        # Выражение без переменных (или не со всеми) дает скаляр или
+        # массив меньшей формы: результат - столбец формы переданных массивов
+        shape = numpy.broadcast_shapes(
+            result.shape, *(numpy.shape(value) for value in bindings.values()))
+        if shape != result.shape:
+            result = numpy.broadcast_to(result, shape).copy()
+        return result
+
+    def _evaluate_float(self, numpy, arrays):
+        arrays = {name: array.astype(numpy.float64) for name, array in arrays.items()}
+
+        def guarded(operation):
+            def apply(left, right):
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    return numpy.where(right == 0, numpy.nan, operation(left, right))
+            return apply
+
+        def load(item):
+            return arrays[item] if isinstance(item, Variable) else float(item)
+
+        result = _interpret(self.compiled.program, load, numpy.add, numpy.subtract,
+                            numpy.multiply, guarded(numpy.true_divide), guarded(numpy.fmod))
+        return numpy.asarray(result, dtype=numpy.float64)
+
+    def _evaluate_objects(self, numpy, arrays):
+        calculator = self.calculator
+        bind = numpy.frompyfunc(calculator._bind_value, 1, 1)
+        arrays = {name: numpy.asarray(bind(array), dtype=object)
+                  for name, array in arrays.items()}
+
+        def per_element(operation):
+            # Ошибка в одной строке не отменяет весь столбец: элемент
+            # становится None, и None проходит через следующие операции
+            def apply(left, right):
+                if left is None or right is None:
+                    return None
+                try:
+                    return operation(left, right)
+                except (ArithmeticError, ValueError):
+                    return None
+            return numpy.frompyfunc(apply, 2, 1)
+
+        operations = [per_element(operation) for operation in calculator._arithmetic()]
+
+        def load(item):
+            return arrays[item] if isinstance(item, Variable) else calculator._bind_value(item)
+
+        result = _interpret(self.compiled.program, load, *operations)
+        return numpy.asarray(result, dtype=object)
+
+
+class ExpressionCache:
+    """Ограниченный LRU-кэш скомпилированных выражений (потокобезопасный)"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Возвращает программу по ключу или None"""
+        with self._lock:
+            compiled = self._data.get(key)
+            if compiled is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return compiled
+
+    def put(self, key, compiled):
+        """Сохраняет программу, вытесняя самую старую при переполнении"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = compiled
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Счетчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            return {
+                'size': len(self._data), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class ResultStore:
+    """Постоянный кэш результатов calculate в файле SQLite.
+
+    Кэш переживает перезапуск и общий для всех процессов, открывших один
+    файл: база работает в режиме WAL, где читатели не ждут писателя, а
+    писатели ждут друг друга не дольше timeout секунд. Ключ - нормализованное
+    выражение, точность и режим. Каждый поток и каждый процесс открывают
+    собственное соединение. Когда записей больше maxsize, удаляются давно
+    не использованные; время использования обновляется не чаще раза
+    в touch_interval секунд, чтобы чтение не превращалось в запись.
+    Файл помечается версией формата ответов (PRAGMA user_version); файл
+    другой версии при открытии очищается, чтобы не отдавать ответы,
+    записанные прежним выводом словами.
+    """
+
+    # Как часто (в записях) проверять переполнение
+    evict_every = 256
+
+    # Версия формата ответов: увеличивается при любом изменении вывода
+    # number_to_text (склонения, дроби, периоды)
+    format_version = 1
+
+    def __init__(self, path, maxsize=100000, timeout=30.0, touch_interval=60.0):
+        import sqlite3
+
+        self.path = os.fspath(path)
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        # Ошибки базы (занята дольше timeout) не ломают вычисления
+        self.errors = 0
+        self._sqlite_error = sqlite3.Error
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " expression TEXT NOT NULL, precision INTEGER NOT NULL,"
+            " exact INTEGER NOT NULL, result TEXT NOT NULL, used REAL NOT NULL,"
+            " PRIMARY KEY (expression, precision, exact)) WITHOUT ROWID")
+        connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        # Проверка и очистка в одной транзакции: процессы, открывающие файл
+        # одновременно, не очистят результаты друг друга дважды
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.format_version:
+                connection.execute("DELETE FROM results")
+                connection.execute(f"PRAGMA user_version = {int(self.format_version)}")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _connection(self):
+        """Соединение текущего потока; после fork открывается заново"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            import sqlite3
+
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def get(self, expression, precision, exact):
+        """Возвращает сохраненный результат или None"""
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT result, used FROM results"
+                " WHERE expression = ? AND precision = ? AND exact = ?",
+                (expression, precision, exact)).fetchone()
+            if row is not None and now - row[1] > self.touch_interval:
+                connection.execute(
+                    "UPDATE results SET used = ?"
+                    " WHERE expression = ? AND precision = ? AND exact = ?",
+                    (now, expression, precision, exact))
+        except self._sqlite_error:
+            with self._lock:
+                self.errors += 1
+            return None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, expression, precision, exact, result):
+        """Сохраняет результат и время от времени вытесняет старые записи"""
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (expression, precision, exact, result, time.time()))
+            if evict:
+                self.evict()
+        except self._sqlite_error:
+            with self._lock:
+                self.errors += 1
+
+    def evict(self):
+        """Оставляет maxsize последних использованных записей"""
+        self._connection().execute(
+            "DELETE FROM results WHERE (expression, precision, exact) IN"
+            " (SELECT expression, precision, exact FROM results"
+            "  ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT count(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM results")
+        with self._lock:
+            self.hits = self.misses = self.errors = 0
+
+    def stats(self):
+        """Счетчики этого объекта и размер базы"""
+        with self._lock:
+            counters = {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+        return {'size': len(self), 'maxsize': self.maxsize, **counters}
+
+    def close(self):
+        """Закрывает соединение текущего потока"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.pid = None
+
+
+class MetricsCollector:
+    """Интерфейс сборщика метрик калькулятора.
+
+    Калькулятор вызывает эти методы только если сборщик передан, поэтому
+    без сборщика инструментирование ничего не стоит. Методы по умолчанию
+    ничего не делают: наследник переопределяет нужные и отправляет данные
+    в свою систему метрик.
+    """
+
+    def stage(self, name, seconds):
+        """Длительность этапа: 'parse', 'evaluate' или 'render'"""
+
+    def count(self, name, value=1):
+        """Счетчик: 'calculations', 'tokens', 'cache_hits', 'cache_misses',
+        'store_hits', 'store_misses'"""
+
+    def error(self, category):
+        """Ошибка вычисления: 'syntax', 'division_by_zero', 'arithmetic',
+        'render' или 'other'"""
+
+
+class InMemoryCollector(MetricsCollector):
+    """Сборщик, который копит метрики в памяти (потокобезопасно)"""
+
     def __init__(self):
-        # Словари для числительных
-        self.units = {
-            'ноль': 0, 'один': 1, 'одна': 1, 'два': 2, 'две': 2, 'три': 3,
-            'четыре': 4, 'пять': 5, 'шесть': 6, 'семь': 7, 'восемь': 8,
-            'девять': 9, 'десять': 10, 'одиннадцать': 11, 'двенадцать': 12,
-            'тринадцать': 13, 'четырнадцать': 14, 'пятнадцать': 15,
-            'шестнадцать': 16, 'семнадцать': 17, 'восемнадцать': 18,
-            'девятнадцать': 19
-        }
-
-        self.tens = {
-            'двадцать': 20, 'тридцать': 30, 'сорок': 40, 'пятьдесят': 50,
-            'шестьдесят': 60, 'семьдесят': 70, 'восемьдесят': 80,
-            'девяносто': 90
-        }
-
-        self.hundreds = {
-            'сто': 100, 'двести': 200, 'триста': 300, 'четыреста': 400,
-            'пятьсот': 500, 'шестьсот': 600, 'семьсот': 700,
-            'восемьсот': 800, 'девятьсот': 900
-        }
-
-        self.fractions = {
-            'десятых': 10, 'сотых': 100, 'тысячных': 1000,
-            'десятитысячных': 10000, 'стотысячных': 100000,
-            'миллионных': 1000000
-        }
-
-        self.operations = {
-            'плюс': '+', 'прибавить': '+', 'сложить': '+',
-            'минус': '-', 'вычесть': '-', 'отнять': '-',
-            'умножить': '*', 'умножить на': '*', 'произведение': '*',
-            'разделить': '/', 'делить': '/', 'деление': '/',
-            'остаток': '%', 'остаток от деления': '%', 'модуль': '%'
-        }
-
-        # Устанавливаем высокую точность
-        getcontext().prec = 20
+        self.timings = {}
+        self.counters = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def stage(self, name, seconds):
+        with self._lock:
+            calls, total = self.timings.get(name, (0, 0.0))
+            self.timings[name] = (calls + 1, total + seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def error(self, category):
+        with self._lock:
+            self.errors[category] += 1
+
+    def snapshot(self):
+        """Копия накопленных метрик"""
+        with self._lock:
+            return {
+                'stages': {name: {'calls': calls, 'seconds': total}
+                           for name, (calls, total) in self.timings.items()},
+                'counters': dict(self.counters),
+                'errors': dict(self.errors),
+            }
+
+
+def _error_category(stage, error):
+    """Категория ошибки для сборщика метрик"""
+    if isinstance(error, DivisionByZeroError):
+        return 'division_by_zero'
+    if isinstance(error, DecimalException):
+        return 'arithmetic'
+    if stage == 'parse':
+        return 'syntax'
+    if stage == 'render':
+        return 'render'
+    return 'other'
+
+
+# Типы токенов лексера
+NUMBER = 'number'        # единицы, десятки, сотни или число цифрами
+SCALE = 'scale'          # тысяча, миллион
+FRACTION = 'fraction'    # десятых, сотых, ...
+AND = 'and'              # "и" между целой и дробной частью
+OPERATOR = 'operator'    # арифметическая операция или скобка
+WORD = 'word'            # незнакомое слово, не влияет на значение
+
+
+class _NumberPhrase:
+    """Число, которое собирается по мере поступления токенов фразы.
+
+    Токены не хранятся: память не зависит от длины фразы, а незнакомые
+    слова только отмечают, что фраза не пуста. Числа цифрами приходят как
+    Decimal, поэтому все действия идут в _EXACT: операторы Decimal взяли бы
+    глобальный контекст потока и округлили бы длинное число.
+    """
+    __slots__ = ('result', 'current', 'largest', 'whole', 'denominator',
+                 'done', 'empty', 'filler')
+
+    def __init__(self):
+        # result, current и largest собирают сначала целую часть, а после
+        # "и" - числитель дроби ("сто двадцать три тысячи ... миллионных")
+        self.result = 0
+        self.current = 0
+        self.largest = 0
+        # Целая часть, когда читается дробная; None - дробной части нет
+        self.whole = None
+        self.denominator = 1
+        # Дробная часть закончилась, остальные токены фразы не влияют на число
+        self.done = False
+        self.empty = True
+        # Во фразе пока только незнакомые слова
+        self.filler = True
+
+    def add(self, kind, value):
+        self.empty = False
+        if kind == WORD or self.done:
+            return
+        self.filler = False
+        if kind == NUMBER:
+            self.current = _EXACT.add(self.current, value)
+        elif kind == SCALE:
+            if value < self.largest:
+                # "два миллиона три тысячи": младший разряд
+                self.result = _EXACT.add(self.result, _EXACT.multiply(self.current or 1, value))
+            else:
+                # "тысяча дециллионов": разряд умножает все число
+                self.result = _EXACT.multiply(_EXACT.add(self.result, self.current) or 1, value)
+                self.largest = value
+            self.current = 0
+        elif kind == AND:
+            # Дробная часть заканчивается на следующем "и"
+            if self.whole is not None:
+                self.done = True
+                return
+            self.whole = _EXACT.add(self.result, self.current)
+            self.result = self.current = self.largest = 0
+        elif kind == FRACTION and self.whole is not None:
+            self.denominator = value
+            self.done = True
+
+    def value(self):
+        number = _EXACT.add(self.result, self.current)
+        if self.whole is None:
+            return number
+        if self.denominator == 1:
+            return self.whole
+        # Знаменатель - степень десяти, поэтому дробь переносится без округления
+        exponent = len(str(self.denominator)) - 1
+        return _EXACT.add(self.whole, number.scaleb(-exponent, _EXACT))
+
+
+class Lexer:
+    """Однопроходный лексер: одно скомпилированное регулярное выражение
+    выделяет слова, числа и символы, а общий словарь сразу их типизирует"""
+
+    pattern = re.compile(r'[а-яё]+|\d*\.?\d+|[-+*/%()]')
+
+    # Размер куска, которыми читается длинный текст
+    chunk_size = 1 << 16
+
+    # Символы, которыми может продолжаться слово или число (кроме цифр
+    # других алфавитов, которые тоже подходят под \d)
+    lexeme_chars = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя0123456789.'
+
+    def __init__(self, units, tens, hundreds, scales, fractions, operations):
+        words = {'и': (AND, None)}
+        for table in (units, tens, hundreds):
+            for word, value in table.items():
+                words[word] = (NUMBER, value)
+        for word, value in scales.items():
+            words[word] = (SCALE, value)
+        for word, value in fractions.items():
+            words[word] = (FRACTION, value)
+        for symbol in '+-*/%()':
+            words[symbol] = (OPERATOR, symbol)
+
+        # Составные операции ("умножить на") хранятся по первому слову,
+        # длинные продолжения проверяются первыми
+        phrases = {}
+        for phrase, symbol in operations.items():
+            head, *tail = phrase.split()
+            if tail:
+                phrases.setdefault(head, []).append((tuple(tail), symbol))
+            else:
+                words[head] = (OPERATOR, symbol)
+
+        self.words = MappingProxyType(words)
+        self.phrases = MappingProxyType({
+            head: tuple(sorted(variants, key=lambda variant: -len(variant[0])))
+            for head, variants in phrases.items()
+        })
+
+    def lexemes(self, source):
+        """Лениво выдает слова, числа и символы из строки или из итерируемого
+        источника кусков текста (файла, генератора).
+
+        Кусок разрезается после последнего символа, который не может
+        продолжать слово или число (пробела, оператора, скобки): хвост после
+        него переносится в следующий кусок, поэтому в памяти держится один
+        кусок, а не весь текст, даже если в нем нет пробелов ("1+2+3+...").
+        """
+        if isinstance(source, str):
+            if len(source) <= self.chunk_size:
+                return map(re.Match.group, self.pattern.finditer(source.lower()))
+            # Длинная строка тоже читается кусками: lower() всего текста
+            # временно занял бы в несколько раз больше памяти, чем сам текст
+            size = self.chunk_size
+            text = source
+            source = (text[start:start + size] for start in range(0, len(text), size))
+        return self._chunked_lexemes(source)
+
+    def _chunked_lexemes(self, chunks):
+        finditer = self.pattern.finditer
+        lexeme_chars = self.lexeme_chars
+        tail = ''
+        for chunk in chunks:
+            text = tail + chunk.lower()
+            cut = len(text.rstrip(lexeme_chars))
+            while cut and text[cut - 1].isdecimal():
+                cut = len(text[:cut - 1].rstrip(lexeme_chars))
+            tail = text[cut:]
+            for match in finditer(text, 0, cut):
+                yield match.group()
+        for match in finditer(tail):
+            yield match.group()
+
+    def tokens(self, source):
+        """Выдает пары (тип, значение) за один линейный проход по тексту.
+
+        source - строка или итерируемый источник кусков текста; составная
+        операция распознается и тогда, когда ее слова попали в разные куски.
+        """
+        words = self.words
+        phrases = self.phrases
+        lexemes = self.lexemes(source)
+        # Слова, прочитанные вперед при проверке составной операции
+        ahead = deque()
+        while True:
+            if ahead:
+                lexeme = ahead.popleft()
+            else:
+                lexeme = next(lexemes, None)
+                if lexeme is None:
+                    return
+            if lexeme in phrases:
+                for tail, symbol in phrases[lexeme]:
+                    while len(ahead) < len(tail):
+                        following = next(lexemes, None)
+                        if following is None:
+                            break
+                        ahead.append(following)
+                    if tuple(islice(ahead, len(tail))) == tail:
+                        for _ in tail:
+                            ahead.popleft()
+                        yield OPERATOR, symbol
+                        break
+                else:
+                    yield words.get(lexeme) or (WORD, lexeme)
+                continue
+            token = words.get(lexeme)
+            if token is None:
+                if lexeme[-1].isdigit():
+                    token = (NUMBER, Decimal(lexeme))
+                else:
+                    token = (WORD, lexeme)
+            yield token
+
+
+def _build_triads(units, tens, hundreds):
+    """Строит названия всех чисел 0..999 в мужском и женском роде"""
+    unit_words = {}
+    for word, value in units.items():
+        unit_words.setdefault(value, word)
+    feminine_words = dict(unit_words)
+    feminine_words.update({1: 'одна', 2: 'две'})
+    tens_words = {value: word for word, value in tens.items()}
+    hundreds_words = {value: word for word, value in hundreds.items()}
+
+    masculine = ['']
+    feminine = ['']
+    for number in range(1, 1000):
+        head = []
+        hundreds_part, remainder = divmod(number, 100)
+        if hundreds_part:
+            head.append(hundreds_words[hundreds_part * 100])
+        if remainder >= 20:
+            tens_part, remainder = divmod(remainder, 10)
+            head.append(tens_words[tens_part * 10])
+
+        for words, table in ((unit_words, masculine), (feminine_words, feminine)):
+            parts = head + [words[remainder]] if remainder else head
+            table.append(' '.join(parts))
+
+    return tuple(masculine), tuple(feminine)
+
+
+def _build_fractions(scale_stems):
+    """Строит названия дробных разрядов: десятых, сотых, тысячных, ..."""
+    fractions = {'десятых': 10, 'сотых': 100}
+    for scale, stem in enumerate(scale_stems, 1):
+        for digits, prefix in enumerate(('', 'десяти', 'сто')):
+            fractions[f"{prefix}{stem}ных"] = 10 ** (scale * 3 + digits)
+    return fractions
+
+
+def _plural_index(number):
+    """Номер формы существительного после числа: тысяча, тысячи, тысяч"""
+    if number % 10 == 1 and number % 100 != 11:
+        return 0
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return 1
+    return 2
+
+
+class AdvancedDecimalCalculator:
+    # Приоритеты операций для алгоритма сортировочной станции
+    PRECEDENCE = MappingProxyType({'+': 1, '-': 1, '*': 2, '/': 2, '%': 2})
+
+    # Словари для числительных. Создаются один раз при импорте и доступны
+    # только для чтения, поэтому их безопасно разделять между экземплярами
+    units = MappingProxyType({
+        'ноль': 0, 'один': 1, 'одна': 1, 'два': 2, 'две': 2, 'три': 3,
+        'четыре': 4, 'пять': 5, 'шесть': 6, 'семь': 7, 'восемь': 8,
+        'девять': 9, 'десять': 10, 'одиннадцать': 11, 'двенадцать': 12,
+        'тринадцать': 13, 'четырнадцать': 14, 'пятнадцать': 15,
+        'шестнадцать': 16, 'семнадцать': 17, 'восемнадцать': 18,
+        'девятнадцать': 19
+    })
+
+    tens = MappingProxyType({
+        'двадцать': 20, 'тридцать': 30, 'сорок': 40, 'пятьдесят': 50,
+        'шестьдесят': 60, 'семьдесят': 70, 'восемьдесят': 80,
+        'девяносто': 90
+    })
+
+    hundreds = MappingProxyType({
+        'сто': 100, 'двести': 200, 'триста': 300, 'четыреста': 400,
+        'пятьсот': 500, 'шестьсот': 600, 'семьсот': 700,
+        'восемьсот': 800, 'девятьсот': 900
+    })
+
+    operations = MappingProxyType({
+        'плюс': '+', 'прибавить': '+', 'сложить': '+',
+        'минус': '-', 'вычесть': '-', 'отнять': '-',
+        'умножить': '*', 'умножить на': '*', 'произведение': '*',
+        'разделить': '/', 'делить': '/', 'деление': '/',
+        'остаток': '%', 'остаток от деления': '%', 'модуль': '%'
+    })
+
+    # Основы названий разрядов: тысяч(ных), миллион(ных), ...
+    scale_stems = (
+        'тысяч', 'миллион', 'миллиард', 'триллион', 'квадриллион',
+        'квинтиллион', 'секстиллион', 'септиллион', 'октиллион',
+        'нониллион', 'дециллион'
+    )
+
+    # Формы названий разрядов для одного, двух и пяти
+    scale_forms = (('тысяча', 'тысячи', 'тысяч'),) + tuple(
+        (stem, stem + 'а', stem + 'ов') for stem in scale_stems[1:]
+    )
+
+    # Разряды во всех формах: тысяча, тысячи, тысяч -> 1000
+    scales = MappingProxyType({
+        form: 1000 ** scale
+        for scale, forms in enumerate(scale_forms, 1) for form in forms
+    })
+
+    # Дробные разряды: десятых, сотых, тысячных, десятитысячных, ...
+    fractions = MappingProxyType(_build_fractions(scale_stems))
+    fraction_names = MappingProxyType({value: word for word, value in fractions.items()})
+    max_fraction_digits = len(str(max(fraction_names))) - 1
+
+    # Таблицы названий всех трехзначных групп и форм разрядов
+    triads, triads_feminine = _build_triads(units, tens, hundreds)
+    plural_forms = tuple(_plural_index(number) for number in range(100))
+
+    # Лексер строится один раз для всего класса
+    lexer = Lexer(units, tens, hundreds, scales, fractions, operations)
+
+    # Названия переменных, доступные во всех выражениях
+    variables = frozenset({'икс', 'игрек', 'зет'})
+
+    # Ограничения разбора: глубина вложенности скобок и число токенов
+    max_depth = 1000
+    max_length = 10 ** 7
+
+    def __init__(self, cache_size=1024, cache=None, exact=False, precision=20,
+                 collector=None, variables=(), max_depth=None, max_length=None,
+                 store=None):
+        # В точном режиме вычисления ведутся в рациональных числах (Fraction)
+        self.exact = exact
+
+        # Собственный контекст калькулятора: глобальный контекст decimal
+        # не меняется, и калькуляторы с разной точностью не мешают друг другу.
+        # При вычислении точность растет с порядком результата
+        self.context = Context(prec=precision)
+
+        # Кэш скомпилированных выражений
+        self.cache = cache if cache is not None else ExpressionCache(cache_size)
+
+        # Необязательный сборщик метрик (MetricsCollector)
+        self.collector = collector
+
+        # Дополнительные названия переменных этого калькулятора
+        if variables:
+            self.variables = self.variables | {name.lower() for name in variables}
+
+        # Необязательный постоянный кэш результатов (ResultStore)
+        self.store = store
+
+        if max_depth is not None:
+            self.max_depth = max_depth
+        if max_length is not None:
+            self.max_length = max_length
 
     def text_to_number(self, text):
         """Преобразует текстовое представление числа в числовое"""
-        text = text.strip()
-        if text == 'ноль':
-            return Decimal('0')
+        text = text.strip().lower()
 
         # Проверяем на отрицательное число
         is_negative = False
@@ -56,66 +808,16 @@ class AdvancedDecimalCalculator:
             is_negative = True
             text = text[6:]
 
-        parts = text.split(' и ')
-        integer_part = parts[0]
-        decimal_part = parts[1] if len(parts) > 1 else None
-
-        # Обрабатываем целую часть
-        integer_value = self._parse_integer_part(integer_part)
-
-        # Обрабатываем дробную часть
-        decimal_value = Decimal('0')
-        if decimal_part:
-            decimal_value = self._parse_decimal_part(decimal_part)
-
-        result = Decimal(str(integer_value)) + decimal_value
-        return -result if is_negative else result
-
-    def _parse_integer_part(self, text):
-        """Парсит целую часть числа"""
-        words = text.split()
-        result = 0
-        current = 0
-
-        for word in words:
-            if word in self.units:
-                current += self.units[word]
-            elif word in self.tens:
-                current += self.tens[word]
-            elif word in self.hundreds:
-                current += self.hundreds[word]
-            elif word == 'тысяча':
-                current *= 1000
-                result += current
-                current = 0
-            elif word == 'миллион':
-                current *= 1000000
-                result += current
-                current = 0
-
-        result += current
-        return result
+        result = self._phrase_to_number(list(self.lexer.tokens(text)))
+        return result.copy_negate() if is_negative else result
 
-    def _parse_decimal_part(self, text):
-        """Парсит дробную часть числа до миллионных"""
-        words = text.split()
-        numerator = 0
-        denominator = 1
-
-        current_num = 0
-        for word in words:
-            if word in self.units:
-                current_num += self.units[word]
-            elif word in self.tens:
-                current_num += self.tens[word]
-            elif word in self.hundreds:
-                current_num += self.hundreds[word]
-            elif word in self.fractions:
-                numerator = current_num
-                denominator = self.fractions[word]
-                break
-
-        return Decimal(str(numerator)) / Decimal(str(denominator))
+    @staticmethod
+    def _phrase_to_number(phrase):
+        """Собирает число из токенов одной числовой фразы"""
+        number = _NumberPhrase()
+        for kind, value in phrase:
+            number.add(kind, value)
+        return number.value()
 
     def _find_repeating_decimal(self, decimal_str, max_period_length=4):
         """Находит периодическую часть в десятичной дроби"""
@@ -149,9 +851,78 @@ class AdvancedDecimalCalculator:
 
         return None, None
 
+    def _periodic_digits(self, numerator, denominator, limit):
+        """Делит столбиком numerator/denominator (numerator < denominator)
+        и возвращает непериодическую часть и период строками.
+
+        Каждый остаток запоминается вместе с позицией цифры, поэтому период
+        находится точно при первом повторе остатка. Если цифр больше limit,
+        возвращает None.
+        """
+        positions = {}
+        digits = []
+        remainder = numerator
+        while remainder and remainder not in positions:
+            if len(digits) >= limit:
+                return None
+            positions[remainder] = len(digits)
+            digit, remainder = divmod(remainder * 10, denominator)
+            digits.append(digit)
+
+        text = ''.join(map(str, digits))
+        if not remainder:
+            return text, ''
+        start = positions[remainder]
+        return text[:start], text[start:]
+
+    def _fraction_to_text(self, number):
+        """Точно преобразует рациональное число в текст.
+
+        Непериодическая часть вместе с периодом должна укладываться
+        в max_fraction_digits знаков (до дециллионных): для более длинных
+        дробей (например, 1/97) нет названия разряда, поэтому дробная часть
+        округляется до миллионных, и к тексту добавляется "(приближенно)".
+        """
+        if number == 0:
+            return "ноль"
+
+        is_negative = number < 0
+        if is_negative:
+            number = -number
+
+        integer_part, remainder = divmod(number.numerator, number.denominator)
+        result = self._integer_to_text(integer_part)
+        approximate = False
+
+        if remainder:
+            digits = self._periodic_digits(remainder, number.denominator, self.max_fraction_digits)
+            if digits is None:
+                # Для слишком длинного периода нет названия разряда
+                approximate = True
+                rounded = self.context.divide(Decimal(remainder), Decimal(number.denominator))
+                rounded = rounded.quantize(Decimal('0.000001'), context=_EXACT)
+                decimal_text = self._decimal_to_text(rounded) if rounded > 0 else ""
+            else:
+                non_periodic, period = digits
+                if period:
+                    decimal_text = self._decimal_to_text_periodic(non_periodic, period)
+                else:
+                    decimal_text = (f"{self._integer_to_text(int(non_periodic))} "
+                                    f"{self._get_fraction_name(10 ** len(non_periodic))}")
+            if decimal_text:
+                result = f"{result} и {decimal_text}"
+
+        if approximate:
+            result = f"{result} (приближенно)"
+        return f"минус {result}" if is_negative else result
+
     def number_to_text(self, number):
         """Преобразует число в текстовое представление с учетом периодичности"""
-        number = Decimal(str(number))
+        if isinstance(number, Fraction):
+            return self._fraction_to_text(number)
+
+        # Целые переводятся напрямую: str() не работает с числами длиннее 4300 цифр
+        number = Decimal(number) if isinstance(number, int) else Decimal(str(number))
 
         if number == 0:
             return "ноль"
@@ -159,13 +930,15 @@ class AdvancedDecimalCalculator:
         # Обработка отрицательных чисел
         is_negative = number < 0
         if is_negative:
-            number = -number
+            number = number.copy_negate()
 
         integer_part = int(number)
-        decimal_part = number - Decimal(integer_part)
+        decimal_part = _EXACT.subtract(number, Decimal(integer_part))
 
-        # Преобразуем дробную часть в строку с высокой точностью
-        decimal_str = format(decimal_part, '.20f').split('.')[1].rstrip('0')
+        # Дробная часть обрезается до 20 знаков, а не округляется: иначе
+        # 0,999...9 округлится до единицы, и перенос в целую часть потеряется
+        decimal_part = decimal_part.quantize(_FRACTION_DIGITS, rounding=ROUND_DOWN, context=_EXACT)
+        decimal_str = format(decimal_part, 'f').split('.')[1].rstrip('0')
 
         # Проверяем на периодичность
         period_start, period = self._find_repeating_decimal(decimal_str)
@@ -180,7 +953,7 @@ class AdvancedDecimalCalculator:
                 result = f"{integer_text} и {periodic_text}"
             else:
                 # Обычная дробь (округляем до миллионных)
-                rounded_decimal = decimal_part.quantize(Decimal('0.000001'))
+                rounded_decimal = decimal_part.quantize(Decimal('0.000001'), context=_EXACT)
                 if rounded_decimal > 0:
                     decimal_text = self._decimal_to_text(rounded_decimal)
                     result = f"{integer_text} и {decimal_text}"
@@ -194,7 +967,8 @@ class AdvancedDecimalCalculator:
     def _decimal_to_text_periodic(self, non_periodic, period):
         """Формирует текст для периодической дроби"""
         non_periodic_text = ""
-        if non_periodic and non_periodic != '0':
+        # Нулевая непериодическая часть ("00" у 1/300) не называется
+        if non_periodic and int(non_periodic):
             non_periodic_num = int(non_periodic)
             non_periodic_text = self._integer_to_text(non_periodic_num)
 
@@ -213,84 +987,74 @@ class AdvancedDecimalCalculator:
         else:
             return f"{period_text} {denominator_periodic} в периоде"
 
+    def _split_triads(self, number):
+        """Делит целое число на трехзначные группы, от старшей к младшей.
+
+        Вместо многократного деления на 1000 число делится пополам по
+        степеням 1000 ** (2 ** k), так что каждое деление работает с
+        частями примерно равной длины.
+        """
+        if number < 1000 ** 8:
+            groups = []
+            while number:
+                number, triad = divmod(number, 1000)
+                groups.append(triad)
+            groups.reverse()
+            return groups
+
+        powers = [1000]
+        while powers[-1] <= number:
+            powers.append(powers[-1] * powers[-1])
+
+        groups = []
+
+        def split(number, level, padded):
+            # Выдает 2 ** level групп; старшие нули пропускаются, пока padded ложно
+            if level == 0:
+                if padded or number:
+                    groups.append(number)
+                return
+            if not padded and number < powers[level - 1]:
+                split(number, level - 1, False)
+                return
+            high, low = divmod(number, powers[level - 1])
+            split(high, level - 1, padded)
+            split(low, level - 1, True)
+
+        split(number, len(powers) - 1, False)
+        return groups
+
     def _integer_to_text(self, number):
         """Преобразует целое число в текст"""
         if number == 0:
             return "ноль"
 
         result = []
-
-        # Миллионы
-        millions = number // 1000000
-        if millions > 0:
-            result.append(self._number_to_text_simple(millions))
-            result.append('миллион' + self._get_plural_suffix(millions))
-            number %= 1000000
-
-        # Тысячи
-        thousands = number // 1000
-        if thousands > 0:
-            result.append(self._number_to_text_simple(thousands, True))
-            result.append('тысяча' + self._get_plural_suffix(thousands, True))
-            number %= 1000
-
-        # Сотни, десятки, единицы
-        if number > 0:
-            result.append(self._number_to_text_simple(number))
-
+        self._triads_to_text(self._split_triads(number), result)
         return ' '.join(result)
 
-    def _number_to_text_simple(self, number, for_thousands=False):
-        """Преобразует числа до 999 в текст"""
-        if number == 0:
-            return ""
-
-        result = []
-
-        # Сотни
-        hundreds = number // 100
-        if hundreds > 0:
-            for key, value in self.hundreds.items():
-                if value == hundreds * 100:
-                    result.append(key)
-                    break
-
-        # Десятки и единицы
-        remainder = number % 100
-        if remainder > 0:
-            if remainder in self.units:
-                if for_thousands and remainder in [1, 2]:
-                    result.append('одна' if remainder == 1 else 'две')
-                else:
-                    result.append(self._get_unit_key(remainder))
-            else:
-                tens_part = (remainder // 10) * 10
-                units_part = remainder % 10
-
-                for key, value in self.tens.items():
-                    if value == tens_part:
-                        result.append(key)
-                        break
-
-                if units_part > 0:
-                    if for_thousands and units_part in [1, 2]:
-                        result.append('одна' if units_part == 1 else 'две')
+    def _triads_to_text(self, groups, result):
+        """Добавляет в result слова для списка трехзначных групп"""
+        top = len(self.scale_forms)
+        # Выше старшего разряда число делится на блоки по top групп:
+        # "тысяча дециллионов", "один дециллион дециллионов"
+        blocks = max(0, (len(groups) - 2) // top)
+        start = 0
+        for end in range(len(groups) - blocks * top, len(groups) + 1, top):
+            if start:
+                result.append(self.scale_forms[-1][self.plural_forms[groups[start - 1] % 100]])
+            scale = end - start - 1
+            for triad in groups[start:end]:
+                if triad:
+                    if scale == 0:
+                        result.append(self.triads[triad])
                     else:
-                        result.append(self._get_unit_key(units_part))
-
-        return ' '.join(result)
-
-    def _get_unit_key(self, number):
-        """Возвращает правильную форму числительного"""
-        forms = {
-            1: 'один', 2: 'два', 3: 'три', 4: 'четыре',
-            5: 'пять', 6: 'шесть', 7: 'семь', 8: 'восемь',
-            9: 'девять', 10: 'десять', 11: 'одиннадцать',
-            12: 'двенадцать', 13: 'тринадцать', 14: 'четырнадцать',
-            15: 'пятнадцать', 16: 'шестнадцать', 17: 'семнадцать',
-            18: 'восемнадцать', 19: 'девятнадцать'
-        }
-        return forms[number]
+                        # Тысяча женского рода: "одна тысяча", "две тысячи"
+                        triads = self.triads_feminine if scale == 1 else self.triads
+                        result.append(triads[triad])
+                        result.append(self.scale_forms[scale - 1][self.plural_forms[triad % 100]])
+                scale -= 1
+            start = end
 
     def _decimal_to_text(self, decimal):
         """Преобразует дробную часть в текст"""
@@ -299,15 +1063,10 @@ class AdvancedDecimalCalculator:
         if not decimal_str:
             return ""
 
+        # Дробь не сокращаем: знаменатель должен остаться степенью десяти
         numerator = int(decimal_str)
         denominator = 10 ** len(decimal_str)
 
-        # Сокращаем дробь если возможно
-        from math import gcd
-        divisor = gcd(numerator, denominator)
-        numerator //= divisor
-        denominator //= divisor
-
         numerator_text = self._integer_to_text(numerator)
         denominator_text = self._get_fraction_name(denominator)
 
@@ -315,139 +1074,372 @@ class AdvancedDecimalCalculator:
 
     def _get_fraction_name(self, denominator):
         """Возвращает название дробной части"""
-        names = {
-            10: 'десятых',
-            100: 'сотых',
-            1000: 'тысячных',
-            10000: 'десятитысячных',
-            100000: 'стотысячных',
-            1000000: 'миллионных'
-        }
-        return names.get(denominator, '')
-
-    def _get_plural_suffix(self, number, for_thousands=False):
-        """Возвращает правильное окончание для тысяч/миллионов"""
-        if for_thousands:
-            if number % 10 == 1 and number % 100 != 11:
-                return ""
-            elif 2 <= number % 10 <= 4 and (number % 100 < 10 or number % 100 >= 20):
-                return "и"
-            else:
-                return ""
-        else:
-            if number % 10 == 1 and number % 100 != 11:
-                return ""
-            elif 2 <= number % 10 <= 4 and (number % 100 < 10 or number % 100 >= 20):
-                return "а"
-            else:
-                return "ов"
+        return self.fraction_names.get(denominator, '')
 
     def parse_expression(self, expression):
         """Парсит математическое выражение с произвольным количеством операций"""
-        expression = expression.lower()
-
-        # Заменяем текстовые операции на символы
-        for text_op, symbol in sorted(self.operations.items(), key=lambda x: -len(x[0])):
-            expression = expression.replace(text_op, f" {symbol} ")
-
-        # Разбиваем на токены
-        tokens = re.findall(r'[-+]?\d*\.?\d+|[+\-*/%()]|[а-я]+', expression)
-        tokens = [token.strip() for token in tokens if token.strip()]
-
-        # Преобразуем числовые токены
-        parsed_tokens = []
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-            if token in ['+', '-', '*', '/', '%', '(', ')']:
-                parsed_tokens.append(token)
-                i += 1
+        return list(self.iter_parse(expression))
+
+    def iter_parse(self, expression):
+        """Лениво выдает числа, переменные и операторы выражения за один проход.
+
+        expression - строка или итерируемый источник кусков текста. Числовая
+        фраза складывается по ходу чтения, а токены считаются в max_length,
+        поэтому длинная фраза без операторов не копится в памяти.
+        """
+        variables = self.variables
+        max_length = self.max_length
+        phrase = _NumberPhrase()
+        # Рядом с переменной незнакомые слова ("разделить на икс") не образуют числа
+        after_variable = False
+        for length, (kind, value) in enumerate(self.lexer.tokens(expression), 1):
+            if length > max_length:
+                raise ValueError(f"Выражение длиннее {max_length} токенов")
+            if kind == OPERATOR:
+                if not phrase.empty:
+                    if not (after_variable and phrase.filler):
+                        yield phrase.value()
+                    phrase = _NumberPhrase()
+                after_variable = False
+                yield value
+            elif kind == WORD and value in variables:
+                if not phrase.empty:
+                    if not phrase.filler:
+                        yield phrase.value()
+                    phrase = _NumberPhrase()
+                after_variable = True
+                yield Variable(value)
             else:
-                # Собираем числовое выражение до следующего оператора
-                number_parts = []
-                while i < len(tokens) and tokens[i] not in ['+', '-', '*', '/', '%', '(', ')']:
-                    number_parts.append(tokens[i])
-                    i += 1
-                number_text = ' '.join(number_parts)
-                try:
-                    number = self.text_to_number(number_text)
-                    parsed_tokens.append(number)
-                except:
-                    raise ValueError(f"Не могу распознать число: {number_text}")
-
-        return parsed_tokens
+                phrase.add(kind, value)
+        if not phrase.empty and not (after_variable and phrase.filler):
+            yield phrase.value()
 
     def evaluate_expression(self, tokens):
         """Вычисляет значение выражения с учетом приоритета операций"""
-
-        def apply_operator(operators, values):
-            operator = operators.pop()
-            right = values.pop()
-            left = values.pop()
-            if operator == '+':
-                values.append(left + right)
-            elif operator == '-':
-                values.append(left - right)
-            elif operator == '*':
-                values.append(left * right)
-            elif operator == '/':
-                if right == 0:
-                    raise ValueError("Деление на ноль")
-                values.append(left / right)
-            elif operator == '%':
-                values.append(left % right)
-
-        def precedence(op):
-            if op in ['+', '-']:
-                return 1
-            if op in ['*', '/', '%']:
-                return 2
-            return 0
-
-        values = []
+        return self.execute(self.to_postfix(tokens))
+
+    def to_postfix(self, tokens):
+        """Переводит токены в постфиксную запись (сортировочная станция)"""
+        return tuple(self.iter_postfix(tokens))
+
+    def iter_postfix(self, tokens):
+        """Лениво переводит поток токенов в постфиксную запись.
+
+        Операторы выдаются сразу, как только их операнды известны, поэтому
+        стек операторов растет только с глубиной скобок. Превышение
+        max_depth или max_length дает ValueError.
+        """
+        precedence = self.PRECEDENCE
+        max_depth = self.max_depth
+        max_length = self.max_length
         operators = []
+        depth = 0
 
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-
-            if isinstance(token, Decimal):
-                values.append(token)
+        for length, token in enumerate(tokens, 1):
+            if length > max_length:
+                raise ValueError(f"Выражение длиннее {max_length} токенов")
+            if isinstance(token, (Decimal, Variable)):
+                yield token
             elif token == '(':
+                depth += 1
+                if depth > max_depth:
+                    raise ValueError(f"Вложенность скобок больше {max_depth}")
                 operators.append(token)
             elif token == ')':
                 while operators and operators[-1] != '(':
-                    apply_operator(operators, values)
+                    yield operators.pop()
+                if not operators:
+                    raise ValueError("Лишняя закрывающая скобка")
                 operators.pop()  # Убираем '('
+                depth -= 1
             else:
                 while (operators and operators[-1] != '(' and
-                       precedence(operators[-1]) >= precedence(token)):
-                    apply_operator(operators, values)
+                       precedence[operators[-1]] >= precedence[token]):
+                    yield operators.pop()
                 operators.append(token)
 
-            i += 1
-
         while operators:
-            apply_operator(operators, values)
-
-        return values[0] if values else Decimal('0')
+            operator = operators.pop()
+            if operator == '(':
+                raise ValueError("Не закрыта скобка")
+            yield operator
+
+    def evaluate_stream(self, source, bindings=None):
+        """Вычисляет выражение, не собирая ни список токенов, ни программу.
+
+        source - строка или итерируемый источник кусков текста, например
+        открытый файл. Лексер, разбор, сортировочная станция и интерпретатор
+        соединены генераторами, поэтому память зависит от глубины скобок,
+        а не от длины выражения.
+        """
+        program = self.iter_postfix(self.iter_parse(source))
+        return _interpret(program, self._loader(bindings), *self._arithmetic())
+
+    def execute(self, program, bindings=None):
+        """Выполняет программу в постфиксной записи.
+
+        bindings задает значения переменных: числа или числа словами.
+        """
+        if isinstance(program, CompiledExpression):
+            program = program.program
+        return _interpret(program, self._loader(bindings), *self._arithmetic())
+
+    def _loader(self, bindings):
+        """Функция, превращающая число или переменную программы в значение"""
+        values = {}
+        if bindings:
+            values = {name: self._bind_value(value) for name, value in bindings.items()}
+        exact = self.exact
+
+        def load(item):
+            if isinstance(item, Variable):
+                if item not in values:
+                    raise ValueError(f"Не задано значение переменной {item}")
+                return values[item]
+            return Fraction(item) if exact else item
+
+        return load
+
+    def _arithmetic(self):
+        """Операции +, -, *, /, % текущего режима с проверкой деления на ноль"""
+        if self.exact:
+            return add, sub, mul, _checked(truediv), _checked(_fraction_remainder)
+        # Точность каждой операции растет с порядком результата: целая часть
+        # больших чисел не обрезается, и сверх нее остается precision цифр.
+        # Оценка идет по порядкам операндов, а не по длине всего выражения,
+        # поэтому длинные суммы не раздувают точность деления
+        context = self.context.copy()
+        base = context.prec
+
+        def scaled(operation, order):
+            def apply(left, right):
+                context.prec = base + max(0, order(left.adjusted(), right.adjusted()))
+                return operation(left, right)
+            return apply
+
+        return (scaled(context.add, _sum_order), scaled(context.subtract, _sum_order),
+                scaled(context.multiply, _product_order),
+                _checked(scaled(context.divide, _quotient_order)),
+                _checked(scaled(context.remainder, _quotient_order)))
+
+    def _bind_value(self, value):
+        """Приводит значение переменной к числу текущего режима"""
+        if isinstance(value, str):
+            value = self.text_to_number(value)
+        elif isinstance(value, float):
+            value = Decimal(repr(value))
+        elif not isinstance(value, (Decimal, Fraction)):
+            value = Decimal(value)
+        if self.exact:
+            return Fraction(value)
+        if isinstance(value, Fraction):
+            return self.context.divide(Decimal(value.numerator), Decimal(value.denominator))
+        return value
+
+    def compile_template(self, expression):
+        """Компилирует выражение с переменными в ExpressionTemplate"""
+        return ExpressionTemplate(self, self.compile(expression))
+
+    @staticmethod
+    def normalize(expression):
+        """Нормализует текст выражения для использования в качестве ключа"""
+        return ' '.join(expression.lower().split())
+
+    def compile(self, expression):
+        """Компилирует выражение в переиспользуемую программу (с кэшем)"""
+        key = self.normalize(expression)
+        return self.cache.get(key) or self._compile_key(key)
+
+    def _compile_key(self, key):
+        compiled = CompiledExpression(key, self.to_postfix(self.parse_expression(key)))
+        self.cache.put(key, compiled)
+        return compiled
 
     def calculate(self, expression):
         """Вычисляет текстовое математическое выражение"""
+        if self.collector is not None:
+            return self._calculate_instrumented(expression)
         try:
-            tokens = self.parse_expression(expression)
-            result = self.evaluate_expression(tokens)
+            if self.store is not None:
+                return self._calculate_stored(expression)
+            result = self.execute(self.compile(expression))
             return self.number_to_text(result)
         except Exception as e:
             return f"Ошибка: {str(e)}"
 
+    def _calculate_stored(self, expression):
+        """calculate через постоянный кэш; сохраняются только успешные результаты"""
+        key = self.normalize(expression)
+        precision = self.context.prec
+        text = self.store.get(key, precision, self.exact)
+        if text is None:
+            text = self.number_to_text(self.execute(self.compile(key)))
+            self.store.put(key, precision, self.exact, text)
+        return text
+
+    def _calculate_instrumented(self, expression):
+        """calculate с замером этапов и счетчиками для сборщика метрик"""
+        collector = self.collector
+        clock = time.perf_counter
+        collector.count('calculations')
+        stage = 'parse'
+        try:
+            start = clock()
+            key = self.normalize(expression)
+            if self.store is not None:
+                text = self.store.get(key, self.context.prec, self.exact)
+                if text is not None:
+                    collector.count('store_hits')
+                    collector.stage(stage, clock() - start)
+                    return text
+                collector.count('store_misses')
+            compiled = self.cache.get(key)
+            if compiled is None:
+                collector.count('cache_misses')
+                compiled = self._compile_key(key)
+                collector.count('tokens', len(compiled.program))
+            else:
+                collector.count('cache_hits')
+            parsed = clock()
+            collector.stage(stage, parsed - start)
+
+            stage = 'evaluate'
+            result = self.execute(compiled)
+            evaluated = clock()
+            collector.stage(stage, evaluated - parsed)
+
+            stage = 'render'
+            text = self.number_to_text(result)
+            collector.stage(stage, clock() - evaluated)
+            if self.store is not None:
+                self.store.put(key, self.context.prec, self.exact, text)
+            return text
+        except Exception as e:
+            collector.error(_error_category(stage, e))
+            return f"Ошибка: {str(e)}"
 
-def calc(expression):
-    calculator = AdvancedDecimalCalculator()
-    return calculator.calculate(expression)
+    def calculate_stream(self, source):
+        """Как calculate, но для очень длинных выражений: без кэша
+        и с вычислением по ходу чтения (см. evaluate_stream)"""
+        try:
+            return self.number_to_text(self.evaluate_stream(source))
+        except Exception as e:
+            return f"Ошибка: {str(e)}"
+
+    def calculate_many(self, expressions, max_workers=None):
+        """Вычисляет выражения в пуле потоков; результаты в порядке входа"""
+        # Пулы импортируются по месту: concurrent.futures заметно удлиняет импорт colc
+        from concurrent.futures import ThreadPoolExecutor
 
-print("Напишите выражение для вычисления")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.calculate, expressions))
 
-result = calc(input())
-print('ответ:', result)
 
+# Общий калькулятор модуля: calc не создает новый экземпляр на каждый вызов,
+# а повторные выражения берутся из его кэша
+default_calculator = AdvancedDecimalCalculator()
+
+
+def calc(expression):
+    return default_calculator.calculate(expression)
+
+
+# Калькулятор процесса-обработчика пакетов, настраивается _init_worker
+_worker_calculator = default_calculator
+
+
+def _init_worker(exact, precision, store=None):
+    global _worker_calculator
+    _worker_calculator = AdvancedDecimalCalculator(
+        exact=exact, precision=precision,
+        store=ResultStore(store) if store is not None else None)
+
+
+def _calculate_chunk(chunk):
+    return [_worker_calculator.calculate(expression) for expression in chunk]
+
+
+def _chunks(expressions, chunk_size):
+    """Нарезает поток выражений на списки; строки файла теряют перевод строки"""
+    expressions = (expression.rstrip('\r\n') for expression in expressions)
+    while True:
+        chunk = list(islice(expressions, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_calculate(expressions, processes=None, chunk_size=256, exact=False, precision=20,
+                   store=None):
+    """Лениво вычисляет выражения из итерируемого источника (списка, файла).
+
+    Выражения читаются пачками по chunk_size и вычисляются в пуле из
+    processes процессов (None - по числу ядер, 0 - в текущем процессе).
+    Результаты выдаются в порядке входа, а в работе одновременно держится
+    не больше двух пачек на процесс, поэтому память не растет с длиной входа.
+    store - путь к файлу ResultStore, общему для всех процессов пула.
+    """
+    chunks = _chunks(expressions, chunk_size)
+
+    if processes == 0:
+        calculator = AdvancedDecimalCalculator(
+            exact=exact, precision=precision,
+            store=ResultStore(store) if store is not None else None)
+        for chunk in chunks:
+            yield from map(calculator.calculate, chunk)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, initializer=_init_worker,
+                             initargs=(exact, precision, store)) as pool:
+        window = 2 * processes
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_calculate_chunk, chunk))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def calculate_many(expressions, processes=None, chunk_size=256, exact=False, precision=20,
+                   store=None):
+    """Вычисляет выражения в пуле процессов и возвращает список результатов"""
+    return list(iter_calculate(expressions, processes, chunk_size, exact, precision, store))
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Калькулятор выражений, записанных словами")
+    parser.add_argument('--batch', action='store_true',
+                        help="читать выражения построчно из stdin и писать ответы в stdout")
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help="число процессов для --batch (0 - без пула)")
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--exact', action='store_true',
+                        help="точные вычисления в рациональных числах")
+    parser.add_argument('--precision', type=int, default=20)
+    parser.add_argument('--store', metavar='PATH',
+                        help="файл SQLite с постоянным кэшем результатов")
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        results = iter_calculate(sys.stdin, args.processes, args.chunk_size,
+                                 args.exact, args.precision, args.store)
+        for result in results:
+            sys.stdout.write(result + '\n')
+        return
+
+    calculator = AdvancedDecimalCalculator(
+        exact=args.exact, precision=args.precision,
+        store=ResultStore(args.store) if args.store else None)
+    print("Напишите выражение для вычисления")
+    result = calculator.calculate(input())
+    print('ответ:', result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Локальный asyncio-сервер калькулятора из colc.py.
+
+Протокол - JSON по строкам поверх TCP или Unix-сокета. Запрос
+    {"id": 1, "expression": "два плюс два"}
+получает ответ
+    {"id": 1, "result": "четыре"}
+или {"id": 1, "error": "..."}; ответы на одном соединении могут приходить
+не по порядку, поэтому id возвращается как есть. Запрос {"command": "stats"}
+возвращает счетчики и задержки сервера.
+
+Запросы собираются в пачки (не больше --batch-size, ожидание не дольше
+--batch-delay) и вычисляются в пуле процессов, поэтому цикл событий не
+блокируется. Очередь ограничена: когда она заполнена, сервер перестает
+читать из сокетов, и клиенты упираются в TCP-буферы. Каждый запрос
+ограничен --timeout секундами, строка запроса - --line-limit байтами:
+на более длинную строку приходит ошибка, и соединение закрывается.
+
+Запуск: python colc_server.py --port 8765
+        python colc_server.py --unix /tmp/colc.sock
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from colc import AdvancedDecimalCalculator, ResultStore, _calculate_chunk, _init_worker
+
+
+def _percentile(ordered, fraction):
+    """Перцентиль отсортированного списка (ближайший ранг)"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LatencyStats:
+    """Счетчики и задержки последних window запросов"""
+
+    def __init__(self, window=10000):
+        self.samples = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.batches = 0
+        self.batched = 0
+
+    def record(self, seconds):
+        self.requests += 1
+        self.samples.append(seconds)
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        return {
+            'requests': self.requests, 'errors': self.errors,
+            'timeouts': self.timeouts, 'batches': self.batches,
+            'mean_batch': self.batched / self.batches if self.batches else 0.0,
+            'p50_ms': _percentile(ordered, 0.50) * 1e3,
+            'p95_ms': _percentile(ordered, 0.95) * 1e3,
+            'p99_ms': _percentile(ordered, 0.99) * 1e3,
+        }
+
+
+class CalculatorServer:
+    """Сервер с микропакетной обработкой запросов в пуле.
+
+    processes - число процессов пула (None - по числу ядер, 0 - один поток
+    в текущем процессе), остальные параметры описаны в документации модуля.
+    """
+
+    def __init__(self, processes=None, batch_size=64, batch_delay=0.002,
+                 queue_size=1024, timeout=5.0, connection_limit=256,
+                 line_limit=2 ** 24, exact=False, precision=20, store=None):
+        self.processes = processes
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size
+        self.timeout = timeout
+        # Сколько запросов одного соединения может ждать ответа одновременно
+        self.connection_limit = connection_limit
+        # Наибольшая длина строки запроса в байтах (буфер StreamReader)
+        self.line_limit = line_limit
+        self.worker_args = (exact, precision, store)
+        self.stats = LatencyStats()
+        self._queue = None
+        self._pool = None
+        self._batcher = None
+        self._server = None
+        # Калькулятор сервера при processes=0 и функция вычисления пачки
+        self._calculator = None
+        self._calculate = _calculate_chunk
+        # Пачки в работе: ссылки не дают сборщику мусора удалить задачи
+        self._dispatches = set()
+        # Обработчики открытых соединений и их потоки записи
+        self._connections = {}
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        """Запускает пул, сборщик пачек и слушающий сокет"""
+        if self.processes == 0:
+            # Собственный калькулятор: _init_worker заменил бы калькулятор
+            # всего процесса, и два сервера с разными настройками в одном
+            # процессе мешали бы друг другу
+            exact, precision, store = self.worker_args
+            calculator = self._calculator = AdvancedDecimalCalculator(
+                exact=exact, precision=precision,
+                store=ResultStore(store) if store is not None else None)
+            self._calculate = lambda chunk: list(map(calculator.calculate, chunk))
+            self._pool = ThreadPoolExecutor(1)
+            workers = 1
+        else:
+            workers = self.processes or os.cpu_count() or 1
+            self._pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                             initargs=self.worker_args)
+        self._queue = asyncio.Queue(self.queue_size)
+        # В работе держится не больше двух пачек на обработчик
+        self._slots = asyncio.Semaphore(2 * workers)
+        self._batcher = asyncio.create_task(self._collect())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle, path, limit=self.line_limit)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle, host, port, limit=self.line_limit)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        # Закрытые сокеты дают обработчикам конец ввода, и они завершаются
+        for writer in list(self._connections.values()):
+            writer.close()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+        if self._pool is not None:
+            # shutdown ждет завершения обработчиков - не в цикле событий
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self._pool.shutdown(cancel_futures=True))
+        if self._calculator is not None and self._calculator.store is not None:
+            self._calculator.store.close()
+
+    async def _collect(self):
+        """Собирает запросы из очереди в пачки и отправляет их в пул"""
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                try:
+                    if queue.empty():
+                        item = await asyncio.wait_for(queue.get(), deadline - loop.time())
+                    else:
+                        item = queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+            # Запросы, чье время уже вышло, не вычисляются
+            batch = [(expression, future) for expression, future in batch
+                     if not future.done()]
+            if not batch:
+                continue
+            await self._slots.acquire()
+            self.stats.batches += 1
+            self.stats.batched += len(batch)
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._pool, self._calculate, [expression for expression, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._slots.release()
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def calculate(self, expression):
+        """Вычисляет выражение через очередь с ограничением по времени"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(self._submit(expression, future), self.timeout)
+        finally:
+            future.cancel()
+
+    async def _submit(self, expression, future):
+        await self._queue.put((expression, future))
+        return await future
+
+    async def _respond(self, request, writer, lock, limit, started):
+        try:
+            response = await self._process(request)
+        finally:
+            limit.release()
+        self.stats.record(time.perf_counter() - started)
+        async with lock:
+            writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+            await writer.drain()
+
+    async def _process(self, request):
+        if not isinstance(request, dict):
+            self.stats.errors += 1
+            return {'error': "Запрос должен быть объектом JSON"}
+        response = {'id': request.get('id')}
+        if request.get('command') == 'stats':
+            response['stats'] = {**self.stats.snapshot(), 'queue': self._queue.qsize()}
+            return response
+        expression = request.get('expression')
+        if not isinstance(expression, str):
+            self.stats.errors += 1
+            response['error'] = "Нет строки expression"
+            return response
+        try:
+            response['result'] = await self.calculate(expression)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            response['error'] = "Превышено время ожидания"
+        except Exception as e:
+            self.stats.errors += 1
+            response['error'] = str(e)
+        return response
+
+    async def _handle(self, reader, writer):
+        """Обслуживает одно соединение: строки читаются, пока не исчерпан
+        лимит ожидающих ответа запросов этого соединения"""
+        limit = asyncio.Semaphore(self.connection_limit)
+        lock = asyncio.Lock()
+        tasks = set()
+        handler = asyncio.current_task()
+        self._connections[handler] = writer
+        try:
+            while True:
+                await limit.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Остаток длинной строки не отделить от следующих
+                    # запросов, поэтому после ответа соединение закрывается
+                    limit.release()
+                    self.stats.errors += 1
+                    response = {'error': f"Строка запроса длиннее {self.line_limit} байт"}
+                    async with lock:
+                        writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+                        await writer.drain()
+                    break
+                if not line:
+                    limit.release()
+                    break
+                started = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                task = asyncio.create_task(self._respond(request, writer, lock, limit, started))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self._connections[handler]
+            writer.close()
+
+
+async def serve(args):
+    server = CalculatorServer(
+        processes=args.processes, batch_size=args.batch_size,
+        batch_delay=args.batch_delay, queue_size=args.queue_size,
+        timeout=args.timeout, line_limit=args.line_limit, exact=args.exact,
+        precision=args.precision, store=args.store)
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"colc_server слушает {where}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON-сервер калькулятора выражений")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help="слушать Unix-сокет вместо TCP")
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help="число процессов пула (0 - поток в текущем процессе)")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-delay', type=float, default=0.002,
+                        help="сколько секунд ждать, набирая пачку")
+    parser.add_argument('--queue-size', type=int, default=1024)
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help="ограничение времени на запрос, секунд")
+    parser.add_argument('--line-limit', type=int, default=2 ** 24,
+                        help="наибольшая длина строки запроса, байт")
+    parser.add_argument('--exact', action='store_true')
+    parser.add_argument('--precision', type=int, default=20)
+    parser.add_argument('--store', metavar='PATH',
+                        help="файл SQLite с постоянным кэшем результатов")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,634 @@
-def print_board(board):
-    """Выводит текущее состояние игрового поля."""
-    print("\n   1   2   3")
-    for i in range(3):
-        print(f"{i+1}  {board[i][0]} | {board[i][1]} | {board[i][2]}")
-        if i < 2:
-            print("  -----------")
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-def check_winner(board, player):
-    """Проверяет, выиграл ли игрок (X или O)."""
-    # Проверяем строки, столбцы и диагонали
-    for i in range(3):
-        if all(board[i][j] == player for j in range(3)):  # строка
-            return True
-        if all(board[j][i] == player for j in range(3)):  # столбец
-            return True
-    if board[0][0] == board[1][1] == board[2][2] == player:  # диагональ \
-        return True
-    if board[0][2] == board[1][1] == board[2][0] == player:  # диагональ /
+SIZE = 3
+
+# Направления линий: горизонталь, вертикаль и две диагонали
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+def _win_masks(size=SIZE, k=SIZE):
+    """Маски всех выигрышных линий длины k на поле size x size."""
+    masks = []
+    for row in range(size):
+        for col in range(size):
+            for dr, dc in DIRECTIONS:
+                if 0 <= row + dr * (k - 1) < size and 0 <= col + dc * (k - 1) < size:
+                    masks.append(sum(1 << ((row + dr * i) * size + col + dc * i)
+                                     for i in range(k)))
+    return tuple(masks)
+
+# Линии и полная маска классического поля 3x3
+WIN_MASKS = _win_masks()
+FULL_MASK = (1 << SIZE * SIZE) - 1
+
+# Результат партии вничью (GameState.result)
+DRAW = 'draw'
+
+def _completes_line(mask, row, col, size, k):
+    """Проверяет, лежит ли клетка (row, col) на линии из k меток mask.
+
+    Смотрит только четыре линии через эту клетку, не дальше k - 1 клеток
+    в каждую сторону."""
+    if k == 1:
         return True
+    for dr, dc in DIRECTIONS:
+        count = 1
+        for step_row, step_col in ((dr, dc), (-dr, -dc)):
+            r, c = row + step_row, col + step_col
+            while 0 <= r < size and 0 <= c < size and mask >> (r * size + c) & 1:
+                count += 1
+                if count >= k:
+                    return True
+                r += step_row
+                c += step_col
     return False
 
-def is_full(board):
+class GameState:
+    """Неизменяемое состояние поля size x size с победой при k в ряд.
+
+    Клетки каждого игрока - биты целых чисел x и o, клетка (row, col) -
+    бит row * size + col. Ход возвращает новое состояние, а отмена хода -
+    просто возврат к предыдущему. Победа проверяется по четырем линиям
+    через последний ход, заполненность - по счетчику ходов. Состояния
+    сравниваются и хешируются по расположению меток, поэтому их можно
+    класть в словари и множества.
+    """
+    __slots__ = ('x', 'o', 'size', 'k', 'moves', 'last', 'winner')
+
+    def __init__(self, size=SIZE, k=None, x=0, o=0):
+        self.size = size
+        self.k = k or size
+        if not 1 <= self.k <= size:
+            raise ValueError("Длина линии должна быть от 1 до размера поля")
+        self.x = x
+        self.o = o
+        self.moves = (x | o).bit_count()
+        self.last = None
+        # Для произвольной расстановки победитель ищется полным просмотром
+        self.winner = None
+        for player, mask in (('X', x), ('O', o)):
+            if mask and any(_completes_line(mask, *divmod(cell, size), size, self.k)
+                            for cell in range(size * size) if mask >> cell & 1):
+                self.winner = player
+                break
+
+    def __eq__(self, other):
+        if not isinstance(other, GameState):
+            return NotImplemented
+        return (self.x, self.o, self.size, self.k) == (other.x, other.o, other.size, other.k)
+
+    def __hash__(self):
+        return hash((self.x, self.o, self.size, self.k))
+
+    def __repr__(self):
+        return f"GameState(size={self.size}, k={self.k}, x={self.x}, o={self.o})"
+
+    @property
+    def player(self):
+        """Чей ход: X ходит первым."""
+        return 'X' if self.x.bit_count() == self.o.bit_count() else 'O'
+
+    def mask(self, player):
+        return self.x if player == 'X' else self.o
+
+    def cell(self, row, col):
+        """Символ в клетке: 'X', 'O' или пробел."""
+        bit = 1 << (row * self.size + col)
+        if self.x & bit:
+            return 'X'
+        if self.o & bit:
+            return 'O'
+        return ' '
+
+    def is_free(self, row, col):
+        return not (self.x | self.o) & (1 << (row * self.size + col))
+
+    def play(self, row, col, player=None):
+        """Новое состояние с ходом игрока (по умолчанию того, чья очередь)."""
+        size = self.size
+        # Без проверки строка за краем поля перешла бы на следующую строку
+        if not (0 <= row < size and 0 <= col < size):
+            raise ValueError(f"Клетка ({row}, {col}) вне поля {size}x{size}")
+        if self.winner is not None or self.moves == size * size:
+            raise ValueError("Партия окончена")
+        if not self.is_free(row, col):
+            raise ValueError("Эта клетка уже занята!")
+        player = player or self.player
+        bit = 1 << (row * self.size + col)
+        state = GameState.__new__(GameState)
+        state.size = self.size
+        state.k = self.k
+        if player == 'X':
+            state.x = mask = self.x | bit
+            state.o = self.o
+        else:
+            state.x = self.x
+            state.o = mask = self.o | bit
+        state.moves = self.moves + 1
+        state.last = (row, col)
+        state.winner = player if _completes_line(mask, row, col, self.size, self.k) else None
+        return state
+
+    def wins(self, player):
+        return self.winner == player
+
+    def is_full(self):
+        return self.moves == self.size * self.size
+
+    # Интерфейс движка для программного управления партией
+
+    def legal_moves(self):
+        """Свободные клетки (строка, столбец); пусто, если партия окончена."""
+        if self.winner is not None:
+            return []
+        occupied = self.x | self.o
+        size = self.size
+        return [divmod(cell, size) for cell in range(size * size) if not occupied >> cell & 1]
+
+    def apply(self, move):
+        """Новое состояние после хода move = (строка, столбец)."""
+        return self.play(*move)
+
+    def result(self):
+        """'X' или 'O' - победитель, DRAW - ничья, None - партия продолжается."""
+        if self.winner is not None:
+            return self.winner
+        if self.is_full():
+            return DRAW
+        return None
+
+def symmetry_permutations(size=SIZE):
+    """8 симметрий поля (повороты и отражения) как перестановки клеток:
+    perm[cell] - куда переходит клетка."""
+    last = size - 1
+    transforms = [
+        lambda r, c: (r, c), lambda r, c: (c, last - r),
+        lambda r, c: (last - r, last - c), lambda r, c: (last - c, r),
+        lambda r, c: (r, last - c), lambda r, c: (last - r, c),
+        lambda r, c: (c, r), lambda r, c: (last - c, last - r),
+    ]
+    permutations = []
+    for transform in transforms:
+        permutation = []
+        for cell in range(size * size):
+            row, col = transform(*divmod(cell, size))
+            permutation.append(row * size + col)
+        permutations.append(tuple(permutation))
+    return permutations
+
+def _symmetry_tables(size=SIZE):
+    """Для каждой симметрии таблица, переводящая маску клеток в маску
+    преобразованного поля."""
+    tables = []
+    for permutation in symmetry_permutations(size):
+        table = [0] * (1 << size * size)
+        for mask in range(1, len(table)):
+            low = mask & -mask
+            table[mask] = table[mask ^ low] | 1 << permutation[low.bit_length() - 1]
+        tables.append(table)
+    return tables
+
+SYMMETRY_TABLES = _symmetry_tables()
+
+def canonical(me, them):
+    """Ключ позиции, одинаковый для всех ее поворотов и отражений."""
+    return min((table[me] << (SIZE * SIZE)) | table[them] for table in SYMMETRY_TABLES)
+
+# Порядок перебора ходов: центр, углы, края
+MOVE_ORDER = tuple(1 << cell for cell in (4, 0, 2, 6, 8, 1, 3, 5, 7))
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+class NegamaxAI:
+    """Компьютерный игрок: негамакс с альфа-бета отсечением.
+
+    Оценка позиции для игрока, чей ход: победа дает число свободных клеток
+    плюс один (быстрая победа лучше медленной), поражение - то же со знаком
+    минус, ничья - ноль. Позиции хранятся в таблице транспозиций по ключу
+    canonical, поэтому симметричные позиции считаются один раз; таблица
+    сохраняется между ходами. nodes - число просмотренных позиций
+    за последний вызов best_move.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.nodes = 0
+
+    def best_move(self, state):
+        """Лучший ход (строка, столбец) для игрока, чья очередь."""
+        if (state.size, state.k) != (SIZE, SIZE):
+            raise ValueError("Компьютер играет только на поле 3x3")
+        self.nodes = 0
+        player = state.player
+        me = state.mask(player)
+        them = state.mask('O' if player == 'X' else 'X')
+        occupied = me | them
+        best, best_score = None, None
+        for bit in MOVE_ORDER:
+            if occupied & bit:
+                continue
+            score = -self._negamax(them, me | bit, -100, 100)
+            if best_score is None or score > best_score:
+                best, best_score = bit, score
+        if best is None:
+            raise ValueError("Поле заполнено")
+        return divmod(best.bit_length() - 1, SIZE)
+
+    def _negamax(self, me, them, alpha, beta):
+        self.nodes += 1
+        occupied = me | them
+        free = SIZE * SIZE - occupied.bit_count()
+        for win in WIN_MASKS:
+            if them & win == win:
+                return -(free + 1)
+        if not free:
+            return 0
+
+        # Немедленная победа не требует перебора
+        for win in WIN_MASKS:
+            missing = win & ~me
+            if missing and not missing & (missing - 1) and not missing & occupied:
+                return free
+
+        key = canonical(me, them)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        original_alpha = alpha
+        best = -100
+        for bit in MOVE_ORDER:
+            if occupied & bit:
+                continue
+            score = -self._negamax(them, me | bit, -beta, -alpha)
+            if score > best:
+                best = score
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (best, flag)
+        return best
+
+_neighbor_masks = {}
+
+def _neighbors(size):
+    """Для каждой клетки маска соседних клеток (включая диагонали), по полю size."""
+    masks = _neighbor_masks.get(size)
+    if masks is None:
+        masks = []
+        for row in range(size):
+            for col in range(size):
+                mask = 0
+                for r in range(max(0, row - 1), min(size, row + 2)):
+                    for c in range(max(0, col - 1), min(size, col + 2)):
+                        mask |= 1 << (r * size + c)
+                masks.append(mask)
+        _neighbor_masks[size] = masks
+    return masks
+
+def candidate_moves(state):
+    """Свободные клетки рядом с уже поставленными метками (на пустом поле -
+    центр): на больших полях дальние ходы почти никогда не лучше."""
+    size = state.size
+    occupied = state.x | state.o
+    if not occupied:
+        return [(size // 2) * size + size // 2]
+    neighbors = _neighbors(size)
+    area = 0
+    for cell in range(size * size):
+        if occupied >> cell & 1:
+            area |= neighbors[cell]
+    area &= ~occupied
+    return [cell for cell in range(size * size) if area >> cell & 1]
+
+def _playout(state, rng):
+    """Доигрывает партию случайными ходами, возвращает победителя или None."""
+    if state.winner is not None:
+        return state.winner
+    size, k = state.size, state.k
+    x, o = state.x, state.o
+    occupied = x | o
+    free = [cell for cell in range(size * size) if not occupied >> cell & 1]
+    rng.shuffle(free)
+    player = state.player
+    for cell in free:
+        row, col = divmod(cell, size)
+        if player == 'X':
+            x |= 1 << cell
+            if _completes_line(x, row, col, size, k):
+                return 'X'
+            player = 'O'
+        else:
+            o |= 1 << cell
+            if _completes_line(o, row, col, size, k):
+                return 'O'
+            player = 'X'
+    return None
+
+class _Node:
+    """Узел дерева поиска; wins считаются для игрока, сделавшего ход move."""
+    __slots__ = ('state', 'parent', 'move', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, state, parent=None, move=None):
+        self.state = state
+        self.parent = parent
+        self.move = move
+        self.children = []
+        self.untried = candidate_moves(state) if state.winner is None and not state.is_full() else []
+        self.visits = 0
+        self.wins = 0.0
+
+def _search(root, rng, seconds, playouts, exploration):
+    """Выполняет итерации UCT от корня, пока не исчерпан бюджет, но не меньше
+    одной. Возвращает число выполненных доигрываний."""
+    deadline = time.perf_counter() + seconds if seconds is not None else None
+    done = 0
+    while not done or (playouts is None or done < playouts) and (
+            deadline is None or done % 16 or time.perf_counter() < deadline):
+        node = root
+        # Выбор: спускаемся по лучшей верхней границе UCB1
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda child: child.wins / child.visits
+                       + exploration * math.sqrt(log_visits / child.visits))
+        # Расширение: одна новая вершина
+        if node.untried:
+            cell = node.untried.pop(rng.randrange(len(node.untried)))
+            child = _Node(node.state.play(*divmod(cell, node.state.size)), node, cell)
+            node.children.append(child)
+            node = child
+        # Доигрывание и обратное распространение результата
+        winner = _playout(node.state, rng)
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif node.parent is not None and winner == node.parent.state.player:
+                node.wins += 1
+            node = node.parent
+        done += 1
+    return done
+
+def _search_worker(size, k, x, o, seconds, playouts, exploration, seed):
+    """Независимый поиск в процессе пула: статистика ходов корня."""
+    root = _Node(GameState(size, k, x, o))
+    _search(root, random.Random(seed), seconds, playouts, exploration)
+    return {child.move: (child.visits, child.wins) for child in root.children}
+
+class MCTSAI:
+    """Компьютерный игрок для больших полей: поиск по дереву Монте-Карло (UCT).
+
+    Бюджет хода - seconds секунд или playouts доигрываний (что наступит
+    раньше). Поддерево выбранного хода сохраняется до следующего вызова и
+    переиспользуется, если соперник ответил ходом, который уже есть в дереве.
+    При processes > 1 несколько процессов ищут независимо, а их статистика
+    ходов корня складывается (параллелизм по корню); дерево тогда
+    не переиспользуется. nodes - число доигрываний за последний ход.
+    """
+
+    def __init__(self, seconds=1.0, playouts=None, processes=0, exploration=1.4, seed=None):
+        if seconds is None and playouts is None:
+            raise ValueError("Нужен бюджет хода: seconds или playouts")
+        if seconds is not None and seconds <= 0:
+            raise ValueError("Время на ход должно быть положительным")
+        if playouts is not None and playouts < 1:
+            raise ValueError("Число доигрываний должно быть положительным")
+        self.seconds = seconds
+        self.playouts = playouts
+        self.processes = processes
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.root = None
+        self.nodes = 0
+        self._pool = None
+
+    def best_move(self, state):
+        """Лучший найденный ход (строка, столбец) для игрока, чья очередь."""
+        if state.winner is not None or state.is_full():
+            raise ValueError("Партия окончена")
+        move = self._forced_move(state)
+        if move is None:
+            if self.processes and self.processes > 1:
+                move = self._parallel_search(state)
+            else:
+                move = self._tree_search(state)
+        else:
+            self.nodes = 0
+            self.root = None
+        return divmod(move, state.size)
+
+    def _forced_move(self, state):
+        """Выигрывающий ход или защита от немедленного выигрыша соперника."""
+        size, k = state.size, state.k
+        player = state.player
+        me = state.mask(player)
+        them = state.mask('O' if player == 'X' else 'X')
+        block = None
+        for cell in candidate_moves(state):
+            row, col = divmod(cell, size)
+            if _completes_line(me | 1 << cell, row, col, size, k):
+                return cell
+            if block is None and _completes_line(them | 1 << cell, row, col, size, k):
+                block = cell
+        return block
+
+    def _reuse(self, state):
+        """Узел сохраненного дерева для state (ход соперника уже в дереве)."""
+        root = self.root
+        if root is None:
+            return None
+        if root.state == state:
+            return root
+        for child in root.children:
+            if child.state == state:
+                return child
+        return None
+
+    def _tree_search(self, state):
+        root = self._reuse(state) or _Node(state)
+        root.parent = None
+        self.nodes = _search(root, self.rng, self.seconds, self.playouts, self.exploration)
+        if not root.children:
+            self.root = None
+            return candidate_moves(state)[0]
+        best = max(root.children, key=lambda child: child.visits)
+        # Оставляем поддерево выбранного хода, остальное освобождается
+        best.parent = None
+        self.root = best
+        return best.move
+
+    def _parallel_search(self, state):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes)
+        playouts = self.playouts and -(-self.playouts // self.processes)
+        futures = [self._pool.submit(_search_worker, state.size, state.k, state.x, state.o,
+                                     self.seconds, playouts, self.exploration,
+                                     self.rng.getrandbits(64))
+                   for _ in range(self.processes)]
+        totals = {}
+        for future in futures:
+            for move, (visits, wins) in future.result().items():
+                total = totals.get(move, (0, 0.0))
+                totals[move] = (total[0] + visits, total[1] + wins)
+        self.nodes = sum(visits for visits, _ in totals.values())
+        if not totals:
+            return candidate_moves(state)[0]
+        return max(totals, key=lambda move: totals[move][0])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+class RandomAI:
+    """Игрок, делающий случайные допустимые ходы (для самоигры и проверок)."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.nodes = 0
+
+    def best_move(self, state):
+        return self.rng.choice(state.legal_moves())
+
+def play_game(agents, state=None):
+    """Проводит партию без ввода и вывода и возвращает конечное состояние.
+
+    agents - словарь {'X': агент, 'O': агент}; агент - любой объект с методом
+    best_move(state), возвращающим (строка, столбец).
+    """
+    if state is None:
+        state = GameState()
+    while state.result() is None:
+        state = state.apply(agents[state.player].best_move(state))
+    return state
+
+def print_board(state):
+    """Выводит текущее состояние игрового поля."""
+    size = state.size
+    width = len(str(size))
+    print("\n" + " " * (width + 2) + " ".join(f"{i+1:<3}" for i in range(size)).rstrip())
+    for i in range(size):
+        print(f"{i+1:<{width}}  " + " | ".join(state.cell(i, j) for j in range(size)))
+        if i < size - 1:
+            print(" " * (width + 1) + "-" * (4 * size - 1))
+
+def check_winner(state, player):
+    """Проверяет, выиграл ли игрок (X или O)."""
+    return state.wins(player)
+
+def is_full(state):
     """Проверяет, заполнено ли поле (ничья)."""
-    return all(board[i][j] != ' ' for i in range(3) for j in range(3))
+    return state.is_full()
+
+def parse_move(text, size=SIZE):
+    """Разбирает ввод 'строка столбец' (с 1) в индексы клетки (с 0).
 
-def get_move(player):
+    При ошибке бросает ValueError с сообщением для игрока."""
+    try:
+        row, col = map(int, text.split())
+    except ValueError:
+        raise ValueError("Введите два числа через пробел (например, '1 2').") from None
+    if not (1 <= row <= size and 1 <= col <= size):
+        raise ValueError(f"Координаты должны быть от 1 до {size}.")
+    return row - 1, col - 1  # перевод в индексы 0..size-1
+
+def get_move(player, size=SIZE):
     """Запрашивает у игрока координаты хода и проверяет их корректность."""
     while True:
+        move = input(f"Игрок {player}, введите координаты (строка и столбец, например '1 2'): ").strip()
         try:
-            move = input(f"Игрок {player}, введите координаты (строка и столбец, например '1 2'): ").strip()
-            row, col = map(int, move.split())
-            if 1 <= row <= 3 and 1 <= col <= 3:
-                return row - 1, col - 1  # перевод в индексы 0..2
-            else:
-                print("Координаты должны быть от 1 до 3. Попробуйте снова.")
-        except ValueError:
-            print("Введите два числа через пробел (например, '1 2'). Попробуйте снова.")
+            return parse_move(move, size)
+        except ValueError as e:
+            print(f"{e} Попробуйте снова.")
+
+class HumanPlayer:
+    """Игрок за клавиатурой: ходы запрашиваются через get_move."""
+
+    def best_move(self, state):
+        while True:
+            row, col = get_move(state.player, state.size)
+            if state.is_free(row, col):
+                return row, col
+            print("Эта клетка уже занята! Выберите другую.")
 
-def main():
-    # Инициализация пустого поля 3x3
-    board = [[' ' for _ in range(3)] for _ in range(3)]
-    current_player = 'X'  # первый ход — X
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Крестики-нолики")
+    parser.add_argument('--size', type=int, default=SIZE, help="размер поля")
+    parser.add_argument('-k', '--win-length', type=int, default=None,
+                        help="сколько меток в ряд нужно для победы (по умолчанию - размер поля)")
+    parser.add_argument('--think', type=float, default=1.0,
+                        help="сколько секунд компьютер думает над ходом на больших полях")
+    parser.add_argument('-j', '--processes', type=int, default=0,
+                        help="процессов для поиска компьютера на больших полях")
+    parser.add_argument('--table', metavar='PATH',
+                        help="играть по готовой таблице идеальной игры (qefgw_table.py)")
+    args = parser.parse_args(argv)
+    if args.think <= 0:
+        parser.error("--think должно быть положительным")
+
+    # Пустое поле size x size
+    state = GameState(args.size, args.win_length)  # первый ход — X
 
     print("Добро пожаловать в Крестики‑нолики!")
-    print_board(board)
+    computer = None
+    answer = input("Играть против компьютера? (д/н): ").strip().lower()
+    if answer in ('д', 'да', 'y', 'yes'):
+        # Компьютер играет за O: по таблице, если она задана, на поле 3x3 -
+        # полным перебором, на больших - MCTS
+        if args.table:
+            from qefgw_table import PerfectPlayTable
 
-    while True:
-        # Получаем ход игрока
-        row, col = get_move(current_player)
+            computer = PerfectPlayTable(args.table)
+            if (computer.size, computer.k) != (state.size, state.k):
+                parser.error("таблица построена для другого поля")
+        elif (state.size, state.k) == (SIZE, SIZE):
+            computer = NegamaxAI()
+        else:
+            computer = MCTSAI(seconds=args.think, processes=args.processes)
+    agents = {'X': HumanPlayer(), 'O': computer or HumanPlayer()}
+    print_board(state)
 
-        # Проверяем, что клетка свободна
-        if board[row][col] != ' ':
-            print("Эта клетка уже занята! Выберите другую.")
-            continue
+    while state.result() is None:
+        # Получаем ход игрока или компьютера
+        agent = agents[state.player]
+        start = time.perf_counter()
+        row, col = agent.best_move(state)
+        if agent is computer:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"\nКомпьютер ходит: {row + 1} {col + 1} "
+                  f"(просмотрено позиций: {computer.nodes}, {elapsed:.1f} мс)")
 
         # Ставим символ игрока
-        board[row][col] = current_player
-        print_board(board)
-
-        # Проверяем победу
-        if check_winner(board, current_player):
-            print(f"\nИгрок {current_player} победил! Поздравляем!")
-            break
+        state = state.apply((row, col))
+        print_board(state)
 
-        # Проверяем ничью
-        if is_full(board):
-            print("\nНичья! Поле заполнено.")
-            break
+    result = state.result()
+    if result == DRAW:
+        print("\nНичья! Поле заполнено.")
+    else:
+        print(f"\nИгрок {result} победил! Поздравляем!")
 
-        # Передаем ход другому игроку
-        current_player = 'O' if current_player == 'X' else 'X'
+    if isinstance(computer, MCTSAI):
+        computer.close()
 
 if __name__ == "__main__":
     main()
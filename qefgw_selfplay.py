@@ -0,0 +1,134 @@
+"""Самоигра агентов крестиков-ноликов из qefgw.py в пуле процессов.
+
+Партии раздаются процессам пачками по --chunk-size, в работе держится не
+больше двух пачек на процесс, а сводка (победы X и O, ничьи, партий в
+секунду) печатается по мере готовности пачек, поэтому миллионы партий не
+копятся в памяти. Агенты создаются один раз на процесс и переживают
+партии: таблица транспозиций негамакса заполняется один раз.
+
+Запуск: python qefgw_selfplay.py --games 1000000 -x random -o negamax
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from qefgw import DRAW, SIZE, GameState, MCTSAI, NegamaxAI, RandomAI, play_game
+
+
+def make_agent(name, seed=None, playouts=200):
+    """Агент по имени: random, negamax или mcts (бюджет - playouts доигрываний)."""
+    if name == 'random':
+        return RandomAI(seed)
+    if name == 'negamax':
+        return NegamaxAI()
+    if name == 'mcts':
+        return MCTSAI(seconds=None, playouts=playouts, seed=seed)
+    raise ValueError(f"Неизвестный агент: {name}")
+
+
+AGENT_NAMES = ('random', 'negamax', 'mcts')
+
+# Агенты и правила процесса-обработчика, настраиваются _init_worker
+_worker = None
+
+
+def _init_worker(x, o, size, k, playouts, seed, mix_pid=True):
+    global _worker
+    # В пуле к зерну добавляется pid, чтобы процессы играли разные партии
+    if seed is not None and mix_pid:
+        seed = f"{seed}:{os.getpid()}"
+    rng = random.Random(seed)
+    agents = {'X': make_agent(x, rng.getrandbits(64), playouts),
+              'O': make_agent(o, rng.getrandbits(64), playouts)}
+    _worker = (agents, size, k)
+
+
+def _play_chunk(games):
+    """Играет games партий; возвращает счетчик результатов и число ходов."""
+    agents, size, k = _worker
+    results = Counter()
+    start = GameState(size, k)
+    for _ in range(games):
+        state = play_game(agents, start)
+        results[state.result()] += 1
+        results['moves'] += state.moves
+    return results
+
+
+def _chunks(games, chunk_size):
+    while games > 0:
+        yield min(chunk_size, games)
+        games -= chunk_size
+
+
+def iter_selfplay(games, x='random', o='random', size=SIZE, k=None, processes=None,
+                  chunk_size=1000, playouts=200, seed=None):
+    """Лениво выдает счетчики результатов ('X', 'O', DRAW, 'moves') по пачкам.
+
+    processes=None - по числу ядер, 0 - в текущем процессе.
+    """
+    initargs = (x, o, size, k, playouts, seed)
+    chunks = _chunks(games, chunk_size)
+
+    if processes == 0:
+        _init_worker(*initargs, mix_pid=False)
+        for chunk in chunks:
+            yield _play_chunk(chunk)
+        return
+
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs) as pool:
+        window = 2 * processes
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_play_chunk, chunk))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def format_stats(totals, seconds):
+    games = totals['X'] + totals['O'] + totals[DRAW]
+    if not games:
+        return "партий: 0"
+    share = lambda key: 100 * totals[key] / games
+    return (f"партий: {games}  X: {share('X'):.1f}%  O: {share('O'):.1f}%  "
+            f"ничьи: {share(DRAW):.1f}%  ходов в партии: {totals['moves'] / games:.1f}  "
+            f"партий/с: {games / seconds:.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Самоигра агентов крестиков-ноликов")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('-x', choices=AGENT_NAMES, default='random', help="агент за X")
+    parser.add_argument('-o', choices=AGENT_NAMES, default='random', help="агент за O")
+    parser.add_argument('--size', type=int, default=SIZE)
+    parser.add_argument('-k', '--win-length', type=int, default=None)
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help="число процессов (0 - без пула)")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--playouts', type=int, default=200,
+                        help="доигрываний на ход для агента mcts")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--report-every', type=float, default=1.0,
+                        help="как часто печатать промежуточную сводку, секунд")
+    args = parser.parse_args(argv)
+
+    totals = Counter()
+    start = last_report = time.perf_counter()
+    for results in iter_selfplay(args.games, args.x, args.o, args.size, args.win_length,
+                                 args.processes, args.chunk_size, args.playouts, args.seed):
+        totals.update(results)
+        now = time.perf_counter()
+        if now - last_report >= args.report_every:
+            print(format_stats(totals, now - start), flush=True)
+            last_report = now
+    print(format_stats(totals, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
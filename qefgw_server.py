@@ -0,0 +1,330 @@
+"""Сервер партий крестиков-ноликов из qefgw.py на asyncio.
+
+Протокол - JSON по строкам поверх TCP; ответы на одном соединении идут
+в порядке запросов, id возвращается как есть:
+    {"id": 1, "command": "new", "size": 3, "k": 3, "opponent": "negamax"}
+    {"id": 2, "command": "move", "session": 1, "move": "2 2"}
+    {"id": 3, "command": "state", "session": 1}
+    {"id": 4, "command": "close", "session": 1}
+    {"id": 5, "command": "stats"}
+Ответ на new, move и state содержит поле board (строки поля, '.' - пусто),
+player (чей ход) и result ('X', 'O', 'draw' или null); на move против
+компьютера - еще reply, его ход "строка столбец". Ошибки приходят в поле
+error с теми же сообщениями, что и в консольной игре.
+
+Партия хранится как GameState (два целых числа и счетчик ходов) в слотовом
+объекте сессии; сессии без запросов дольше --idle-timeout секунд удаляются.
+На строку запроса длиннее --line-limit байт приходит ошибка, и соединение
+закрывается.
+
+Запуск:         python qefgw_server.py --port 8766
+Нагрузочный тест: python qefgw_server.py --load-test 1000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import deque
+
+from qefgw import SIZE, GameState, NegamaxAI, RandomAI, parse_move
+
+OPPONENTS = ('random', 'negamax')
+
+
+class Session:
+    """Одна партия: состояние поля, соперник-компьютер и время последнего запроса."""
+    __slots__ = ('state', 'opponent', 'touched')
+
+    def __init__(self, state, opponent, touched):
+        self.state = state
+        self.opponent = opponent
+        self.touched = touched
+
+
+def _percentile(ordered, fraction):
+    """Перцентиль отсортированного списка (ближайший ранг)"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class GameServer:
+    """Сервер многих одновременных партий в одном цикле событий.
+
+    Компьютерные соперники общие для всех сессий: у негамакса одна таблица
+    транспозиций на весь сервер, и после первых партий его ход - поиск
+    в словаре.
+    """
+
+    def __init__(self, max_sessions=100000, idle_timeout=300.0, window=10000,
+                 line_limit=1 << 16):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        # Наибольшая длина строки запроса в байтах (буфер StreamReader)
+        self.line_limit = line_limit
+        self.sessions = {}
+        self.opponents = {'random': RandomAI(), 'negamax': NegamaxAI()}
+        self.moves = 0
+        self.evicted = 0
+        self.samples = deque(maxlen=window)
+        self._ids = itertools.count(1)
+        self._server = None
+        self._reaper = None
+
+    async def start(self, host='127.0.0.1', port=8766):
+        self._reaper = asyncio.create_task(self._evict_idle())
+        # Нагрузочный тест открывает тысячи соединений разом: очередь accept
+        # по умолчанию (100) переполняется, и клиенты ждут повтора SYN секунду
+        self._server = await asyncio.start_server(
+            self._handle, host, port, backlog=4096, limit=self.line_limit)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._reaper is not None:
+            self._reaper.cancel()
+
+    async def _evict_idle(self):
+        """Раз в четверть idle_timeout удаляет простаивающие сессии"""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            self.evict_idle()
+
+    def evict_idle(self, now=None):
+        deadline = (now or time.monotonic()) - self.idle_timeout
+        idle = [number for number, session in self.sessions.items()
+                if session.touched < deadline]
+        for number in idle:
+            del self.sessions[number]
+        self.evicted += len(idle)
+        return len(idle)
+
+    def handle(self, request):
+        """Выполняет один запрос и возвращает ответ (без ввода-вывода)"""
+        if not isinstance(request, dict):
+            return {'error': "Запрос должен быть объектом JSON"}
+        response = {'id': request.get('id')}
+        command = request.get('command')
+        try:
+            if command == 'new':
+                response.update(self._new(request))
+            elif command == 'move':
+                response.update(self._move(request))
+            elif command == 'state':
+                number, session = self._session(request)
+                response.update(self._describe(number, session.state))
+            elif command == 'close':
+                number, _ = self._session(request)
+                del self.sessions[number]
+                response['session'] = number
+            elif command == 'stats':
+                response['stats'] = self.stats()
+            else:
+                response['error'] = f"Неизвестная команда: {command}"
+        except ValueError as e:
+            response['error'] = str(e)
+        return response
+
+    def _new(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise ValueError("Слишком много партий, попробуйте позже")
+        size = request.get('size', SIZE)
+        k = request.get('k')
+        if not isinstance(size, int) or not 1 <= size <= 32:
+            raise ValueError("Размер поля должен быть от 1 до 32")
+        if k is not None and not isinstance(k, int):
+            raise ValueError("Длина линии должна быть числом")
+        name = request.get('opponent')
+        opponent = None
+        if name is not None:
+            if name not in OPPONENTS:
+                raise ValueError(f"Неизвестный соперник: {name}")
+            if name == 'negamax' and (size, k or size) != (SIZE, SIZE):
+                raise ValueError("Компьютер играет только на поле 3x3")
+            opponent = self.opponents[name]
+        state = GameState(size, k)
+        number = next(self._ids)
+        self.sessions[number] = Session(state, opponent, time.monotonic())
+        return self._describe(number, state)
+
+    def _session(self, request):
+        number = request.get('session')
+        # Номер из JSON может оказаться списком или словарем - их нельзя искать в словаре
+        session = self.sessions.get(number) if isinstance(number, int) else None
+        if session is None:
+            raise ValueError("Партия не найдена")
+        session.touched = time.monotonic()
+        return number, session
+
+    def _move(self, request):
+        number, session = self._session(request)
+        state = session.state
+        if state.result() is not None:
+            raise ValueError("Партия окончена")
+        move = request.get('move')
+        if not isinstance(move, str):
+            raise ValueError("Введите два числа через пробел (например, '1 2').")
+        row, col = parse_move(move, state.size)
+        if not state.is_free(row, col):
+            raise ValueError("Эта клетка уже занята! Выберите другую.")
+        state = state.play(row, col)
+        self.moves += 1
+        reply = None
+        if session.opponent is not None and state.result() is None:
+            row, col = session.opponent.best_move(state)
+            state = state.play(row, col)
+            self.moves += 1
+            reply = f"{row + 1} {col + 1}"
+        session.state = state
+        response = self._describe(number, state)
+        if reply is not None:
+            response['reply'] = reply
+        return response
+
+    @staticmethod
+    def _describe(number, state):
+        size = state.size
+        board = [''.join(state.cell(row, col) for col in range(size)).replace(' ', '.')
+                 for row in range(size)]
+        return {'session': number, 'board': board,
+                'player': state.player, 'result': state.result()}
+
+    def stats(self):
+        ordered = sorted(self.samples)
+        return {
+            'sessions': len(self.sessions), 'evicted': self.evicted, 'moves': self.moves,
+            'p50_ms': _percentile(ordered, 0.50) * 1e3,
+            'p99_ms': _percentile(ordered, 0.99) * 1e3,
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Остаток длинной строки не отделить от следующих
+                    # запросов, поэтому после ответа соединение закрывается
+                    response = {'error': f"Строка запроса длиннее {self.line_limit} байт"}
+                    writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                started = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                response = self.handle(request)
+                self.samples.append(time.perf_counter() - started)
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _play_remote(reader, writer, rng, opponent, latencies):
+    """Клиент нагрузки: одна партия случайными ходами против соперника сервера"""
+    async def call(request):
+        started = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - started)
+        return response
+
+    response = await call({'command': 'new', 'opponent': opponent})
+    session = response['session']
+    while response.get('result') is None:
+        free = [(row, col) for row, line in enumerate(response['board'])
+                for col, cell in enumerate(line) if cell == '.']
+        row, col = rng.choice(free)
+        response = await call({'command': 'move', 'session': session,
+                               'move': f"{row + 1} {col + 1}"})
+    await call({'command': 'close', 'session': session})
+
+
+async def load_test(clients, games, opponent='negamax', seed=None):
+    """Запускает сервер и clients соединений, каждое играет games партий.
+    Возвращает (сводка сервера, секунд, задержки на стороне клиентов).
+
+    Клиенты работают в том же цикле событий, что и сервер, поэтому задержки
+    клиентов включают ожидание в очереди цикла; время обработки самим
+    сервером - p50_ms и p99_ms сводки."""
+    server = GameServer()
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    latencies = []
+
+    async def client():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for _ in range(games):
+            await _play_remote(reader, writer, rng, opponent, latencies)
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    seconds = time.perf_counter() - start
+    stats = server.stats()
+    await server.close()
+    return stats, seconds, latencies
+
+
+async def serve(args):
+    server = GameServer(max_sessions=args.max_sessions, idle_timeout=args.idle_timeout,
+                        line_limit=args.line_limit)
+    listener = await server.start(args.host, args.port)
+    print(f"qefgw_server слушает {args.host}:{args.port}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер партий крестиков-ноликов")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--max-sessions', type=int, default=100000)
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help="через сколько секунд без запросов удалять партию")
+    parser.add_argument('--line-limit', type=int, default=1 << 16,
+                        help="наибольшая длина строки запроса, байт")
+    parser.add_argument('--load-test', type=int, metavar='CLIENTS',
+                        help="вместо обслуживания запустить нагрузочный тест с CLIENTS соединениями")
+    parser.add_argument('--games', type=int, default=20,
+                        help="партий на соединение в нагрузочном тесте")
+    parser.add_argument('--opponent', choices=OPPONENTS, default='negamax')
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        stats, seconds, latencies = asyncio.run(
+            load_test(args.load_test, args.games, args.opponent))
+        latencies.sort()
+        print(f"{args.load_test} соединений, {args.load_test * args.games} партий, "
+              f"{len(latencies)} запросов за {seconds:.2f} с")
+        print(f"ходов/с: {stats['moves'] / seconds:.0f}  "
+              f"запросов/с: {len(latencies) / seconds:.0f}")
+        print(f"клиент p50: {_percentile(latencies, 0.50) * 1e3:.2f} мс  "
+              f"p99: {_percentile(latencies, 0.99) * 1e3:.2f} мс")
+        print(f"сервер p50: {stats['p50_ms']:.3f} мс  p99: {stats['p99_ms']:.3f} мс")
+        return
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
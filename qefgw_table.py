@@ -0,0 +1,200 @@
+"""Таблица идеальной игры для крестиков-ноликов из qefgw.py.
+
+Генератор решает все достижимые позиции поля size x size (до 4x4) и пишет
+двоичный файл с прямой адресацией: позиция с метками x и o лежит по
+смещению, равному ее коду в троичной системе (клетка i дает 3**i для X
+и 2 * 3**i для O). Один байт на позицию: в младших двух битах оценка для
+игрока, чей ход (LOSS, DRAW или WIN; 0 - позиция недостижима), в старших
+шести - лучший ход (номер клетки, 63 - хода нет). Каждая позиция с учетом
+поворотов и отражений решается один раз, а записи для симметричных позиций
+получаются перестановкой хода.
+
+Заголовок: b'QTTT', версия формата, размер поля, длина линии, резерв.
+Загрузчик отображает файл в память (mmap), поэтому старт не зависит
+от размера таблицы, а ответ на любую позицию - одно чтение байта.
+
+Запуск: python qefgw_table.py --size 3 -o qefgw3.tbl
+        python qefgw.py --table qefgw3.tbl
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+from qefgw import DRAW, SIZE, GameState, _symmetry_tables, symmetry_permutations
+
+MAGIC = b'QTTT'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBx')
+
+# Оценки позиции для игрока, чей ход
+LOSS, DRAW_VALUE, WIN = 1, 2, 3
+NO_MOVE = 63
+
+# Прямая адресация по троичному коду: 3**16 байт - уже 43 МБ
+MAX_CELLS = 16
+
+
+def position_code(x, o):
+    """Троичный код позиции - смещение ее записи в таблице."""
+    code = 0
+    power = 1
+    while x or o:
+        code += power * ((x & 1) + 2 * (o & 1))
+        x >>= 1
+        o >>= 1
+        power *= 3
+    return code
+
+
+def build(size=SIZE, k=None):
+    """Решает все достижимые позиции; возвращает (таблица, число классов
+    симметрии). Таблица - bytearray длиной 3 ** (size * size)."""
+    cells = size * size
+    if cells > MAX_CELLS:
+        raise ValueError(f"Таблица строится для полей до {MAX_CELLS} клеток")
+    tables = _symmetry_tables(size)
+    permutations = symmetry_permutations(size)
+    inverses = []
+    for permutation in permutations:
+        inverse = [0] * cells
+        for cell, image in enumerate(permutation):
+            inverse[image] = cell
+        inverses.append(inverse)
+    powers = [3 ** cell for cell in range(cells)]
+
+    def canonical(state):
+        return min(((table[state.x] << cells) | table[state.o], index)
+                   for index, table in enumerate(tables))
+
+    # Ключ класса симметрии -> (оценка негамакса, лучший ход в ориентации ключа)
+    solved = {}
+
+    def solve(state):
+        key, index = canonical(state)
+        entry = solved.get(key)
+        if entry is None:
+            result = state.result()
+            if result is None:
+                best, best_cell = None, NO_MOVE
+                for row, col in state.legal_moves():
+                    score = -solve(state.play(row, col))
+                    if best is None or score > best:
+                        best, best_cell = score, row * size + col
+                entry = (best, permutations[index][best_cell])
+            elif result == DRAW:
+                entry = (0, NO_MOVE)
+            else:
+                # Выиграл сделавший последний ход; быстрая победа ценнее
+                entry = (-(cells - state.moves + 1), NO_MOVE)
+            solved[key] = entry
+        return entry[0]
+
+    solve(GameState(size, k))
+
+    # Обход всех достижимых позиций; заполненная запись служит отметкой
+    table = bytearray(3 ** cells)
+    stack = [(GameState(size, k), 0)]
+    while stack:
+        state, code = stack.pop()
+        if table[code]:
+            continue
+        key, index = canonical(state)
+        score, cell = solved[key]
+        if cell != NO_MOVE:
+            cell = inverses[index][cell]
+        value = WIN if score > 0 else LOSS if score < 0 else DRAW_VALUE
+        table[code] = value | cell << 2
+        if state.result() is None:
+            mark = 1 if state.player == 'X' else 2
+            for row, col in state.legal_moves():
+                move = row * size + col
+                stack.append((state.play(row, col), code + mark * powers[move]))
+    return table, len(solved)
+
+
+def write_table(path, table, size, k):
+    """Записывает таблицу с заголовком (через временный файл)."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, size, k))
+        file.write(table)
+    os.replace(temporary, path)
+
+
+class PerfectPlayTable:
+    """Отображенная в память таблица идеальной игры.
+
+    Объект - игрок с методом best_move, его можно передавать в play_game
+    и выбирать в main() qefgw.py.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.k = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: это не таблица крестиков-ноликов")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: неподдерживаемая версия формата {version}")
+        if len(self._map) != HEADER.size + 3 ** (self.size * self.size):
+            self.close()
+            raise ValueError(f"{path}: файл поврежден")
+        self.nodes = 1  # один просмотр на ход
+
+    def lookup(self, state):
+        """(оценка, ход): оценка WIN, DRAW_VALUE или LOSS для игрока, чей ход,
+        ход - (строка, столбец) или None."""
+        if (state.size, state.k) != (self.size, self.k):
+            raise ValueError("Таблица построена для другого поля")
+        entry = self._map[HEADER.size + position_code(state.x, state.o)]
+        if not entry & 3:
+            raise ValueError("Позиция недостижима по правилам")
+        cell = entry >> 2
+        return entry & 3, None if cell == NO_MOVE else divmod(cell, self.size)
+
+    def best_move(self, state):
+        value, move = self.lookup(state)
+        if move is None:
+            raise ValueError("Партия окончена")
+        return move
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Построение таблицы идеальной игры")
+    parser.add_argument('--size', type=int, default=SIZE)
+    parser.add_argument('-k', '--win-length', type=int, default=None)
+    parser.add_argument('-o', '--output', default=None,
+                        help="файл таблицы (по умолчанию qefgw<size>x<k>.tbl)")
+    args = parser.parse_args(argv)
+    k = args.win_length or args.size
+    path = args.output or f"qefgw{args.size}x{k}.tbl"
+
+    start = time.perf_counter()
+    try:
+        table, classes = build(args.size, k)
+    except ValueError as e:
+        parser.error(str(e))
+    seconds = time.perf_counter() - start
+    write_table(path, table, args.size, k)
+    positions = sum(1 for entry in table if entry)
+    print(f"{path}: позиций {positions}, классов симметрии {classes}, "
+          f"{len(table) + HEADER.size} байт, {seconds:.2f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Проверки калькулятора из colc.py: запуск - python -m pytest -q"""
+import random
+from decimal import Decimal, localcontext
+from fractions import Fraction
+
+import pytest
+
+import colc
+
+
+@pytest.fixture
+def calculator():
+    return colc.AdvancedDecimalCalculator()
+
+
+@pytest.mark.parametrize('number', [
+    0, 7, 21, 1000, 1001, 123456789, -42, 10 ** 30 + 5, 2 ** 200,
+])
+def test_integer_round_trip(calculator, number):
+    text = calculator.number_to_text(number)
+    assert calculator.text_to_number(text) == number
+
+
+def test_long_integer_round_trip(calculator):
+    # Больше 4300 цифр: str(int) здесь бросил бы ValueError
+    number = random.Random(1).getrandbits(33220)
+    assert Decimal(number).adjusted() + 1 > 4300
+    text = calculator.number_to_text(number)
+    assert int(calculator.text_to_number(text)) == number
+
+
+@pytest.mark.parametrize('number', [
+    '0.5', '12.25', '0.123456', '3.141592', '-7.000123', '1000000.000001',
+])
+def test_fraction_round_trip(calculator, number):
+    # Числитель с разрядами ("сто двадцать три тысячи ... миллионных")
+    text = calculator.number_to_text(Decimal(number))
+    assert calculator.text_to_number(text) == Decimal(number)
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ("один разделить на три", "ноль и три десятых в периоде"),
+    ("два разделить на три", "ноль и шесть десятых в периоде"),
+    ("два разделить на одиннадцать", "ноль и восемнадцать сотых в периоде"),
+    ("один разделить на два", "ноль и пять десятых"),
+    # Дробная часть 0,999... не должна округляться в потерянную единицу
+    ("один разделить на три умножить на три", "ноль и девять десятых в периоде"),
+    ("десять разделить на три умножить на три", "девять и девять десятых в периоде"),
+])
+def test_periodic_fractions(calculator, expression, expected):
+    assert calculator.calculate(expression) == expected
+
+
+def test_exact_mode_period():
+    calculator = colc.AdvancedDecimalCalculator(exact=True)
+    assert calculator.calculate("один разделить на три умножить на три") == "один"
+    assert calculator.number_to_text(Fraction(1, 7)) == \
+        "ноль и сто сорок две тысячи восемьсот пятьдесят семь миллионных в периоде"
+
+
+def test_exact_mode_zero_pre_period_is_omitted():
+    calculator = colc.AdvancedDecimalCalculator(exact=True)
+    assert calculator.number_to_text(Fraction(1, 300)) == "ноль и три тысячных в периоде"
+
+
+def test_exact_mode_unnamed_period_is_marked():
+    # У 1/97 период из 96 цифр: такого разряда нет, ответ приближенный
+    calculator = colc.AdvancedDecimalCalculator(exact=True)
+    assert calculator.number_to_text(Fraction(1, 97)).endswith("(приближенно)")
+
+
+def test_decimal_fraction(calculator):
+    assert calculator.number_to_text(Decimal('12.000')) == "двенадцать"
+    assert calculator.number_to_text(Decimal('-1.25')) == "минус один и двадцать пять сотых"
+
+
+def test_digit_literals_ignore_global_context(calculator):
+    # Разбор числа идет в точном контексте, а не в decimal.getcontext()
+    digits = "12345678901234567890123456789012345"
+    assert calculator.parse_expression(digits) == [Decimal(digits)]
+    with localcontext() as context:
+        context.prec = 3
+        assert calculator.calculate("1 1234567") == \
+            "один миллион двести тридцать четыре тысячи пятьсот шестьдесят восемь"
+
+
+def test_stream_without_spaces(calculator):
+    # Куски режутся по операторам и скобкам, а не только по пробелам
+    text = "(12+3.5)*7-2/4"
+    for size in range(1, len(text) + 1):
+        chunks = (text[start:start + size] for start in range(0, len(text), size))
+        assert calculator.calculate_stream(chunks) == "сто восемь"
+
+
+def test_result_store_drops_other_format_version(tmp_path):
+    path = tmp_path / 'results.db'
+    store = colc.ResultStore(path)
+    store.put("два", 20, False, "два")
+    store.close()
+
+    class NewFormat(colc.ResultStore):
+        format_version = colc.ResultStore.format_version + 1
+
+    store = colc.ResultStore(path)
+    assert store.get("два", 20, False) == "два"
+    store.close()
+    store = NewFormat(path)
+    assert store.get("два", 20, False) is None
+    store.close()
+
+
+@pytest.mark.parametrize('dtype', [None, object])
+def test_constant_template_is_a_column(calculator, dtype):
+    numpy = pytest.importorskip('numpy')
+    template = calculator.compile_template("два плюс три")
+    result = template.evaluate_array({'икс': numpy.arange(5)}, dtype=dtype)
+    assert result.shape == (5,)
+    assert list(result) == [5] * 5
@@ -0,0 +1,131 @@
+"""Проверки движка крестиков-ноликов из qefgw.py: запуск - python -m pytest -q"""
+import pytest
+
+import qefgw
+import qefgw_table
+from qefgw import DRAW, GameState, MCTSAI, NegamaxAI, RandomAI, play_game
+from qefgw_server import GameServer
+
+
+def play(moves, size=3, k=None):
+    state = GameState(size, k)
+    for move in moves:
+        state = state.apply(move)
+    return state
+
+
+def test_legal_moves_of_empty_board():
+    state = GameState()
+    assert state.legal_moves() == [(row, col) for row in range(3) for col in range(3)]
+    assert state.player == 'X'
+    assert state.result() is None
+
+
+def test_apply_alternates_players_and_keeps_state():
+    start = GameState()
+    state = start.apply((1, 1))
+    assert start.cell(1, 1) == ' '
+    assert state.cell(1, 1) == 'X'
+    assert state.player == 'O'
+    assert (1, 1) not in state.legal_moves()
+    assert state.apply((0, 0)).cell(0, 0) == 'O'
+
+
+@pytest.mark.parametrize('moves, result', [
+    ([(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)], 'X'),
+    ([(0, 0), (1, 0), (2, 2), (1, 1), (0, 1), (1, 2)], 'O'),
+    ([(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)], DRAW),
+])
+def test_result(moves, result):
+    state = play(moves)
+    assert state.result() == result
+    assert state.legal_moves() == []
+
+
+def test_larger_board_with_shorter_line():
+    state = play([(0, 0), (4, 4), (1, 1), (4, 3), (2, 2)], size=5, k=3)
+    assert state.result() == 'X'
+
+
+@pytest.mark.parametrize('move', [(0, 3), (3, 0), (-1, 0), (0, -1)])
+def test_move_outside_board_is_rejected(move):
+    # (0, 3) не должен переходить на клетку (1, 0)
+    with pytest.raises(ValueError):
+        GameState().apply(move)
+
+
+def test_occupied_cell_is_rejected():
+    with pytest.raises(ValueError):
+        GameState().apply((1, 1)).apply((1, 1))
+
+
+def test_move_after_win_is_rejected():
+    state = play([(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+    with pytest.raises(ValueError):
+        state.apply((2, 2))
+    assert state.result() == 'X'
+
+
+def test_move_on_full_board_is_rejected():
+    state = play([(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)])
+    with pytest.raises(ValueError):
+        state.play(0, 0)
+
+
+def test_negamax_draws_against_itself():
+    computer = NegamaxAI()
+    assert play_game({'X': computer, 'O': computer}).result() == DRAW
+
+
+def test_negamax_never_loses_to_random():
+    computer = NegamaxAI()
+    for seed in range(20):
+        agents = {'X': RandomAI(seed), 'O': computer}
+        assert play_game(agents).result() in ('O', DRAW)
+
+
+def test_mcts_takes_the_win():
+    state = play([(3, 3), (0, 0), (3, 4), (0, 1), (3, 5)], size=7, k=4)
+    assert state.player == 'O'
+    state = state.apply((6, 6))
+    move = MCTSAI(seconds=None, playouts=50, seed=1).best_move(state)
+    assert move in ((3, 2), (3, 6))
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'seconds': 0}, {'seconds': None}, {'seconds': None, 'playouts': 0},
+])
+def test_mcts_rejects_empty_budget(kwargs):
+    with pytest.raises(ValueError):
+        MCTSAI(**kwargs)
+
+
+def test_parse_move():
+    assert qefgw.parse_move("1 2") == (0, 1)
+    for text in ("", "1", "a b", "0 1", "1 4"):
+        with pytest.raises(ValueError):
+            qefgw.parse_move(text)
+
+
+def test_perfect_play_table(tmp_path):
+    table, _ = qefgw_table.build(3, 3)
+    path = tmp_path / 'qefgw3.tbl'
+    qefgw_table.write_table(path, table, 3, 3)
+    with qefgw_table.PerfectPlayTable(path) as computer:
+        assert computer.lookup(GameState())[0] == qefgw_table.DRAW_VALUE
+        state = play([(0, 0), (1, 0), (0, 1)])
+        assert computer.best_move(state) == (0, 2)
+        assert play_game({'X': computer, 'O': computer}).result() == DRAW
+
+
+def test_server_session():
+    server = GameServer()
+    response = server.handle({'id': 1, 'command': 'new', 'opponent': 'negamax'})
+    session = response['session']
+    assert response['board'] == ['...', '...', '...']
+    response = server.handle({'command': 'move', 'session': session, 'move': '2 2'})
+    assert response['board'][1][1] == 'X' and 'reply' in response
+    response = server.handle({'command': 'move', 'session': session, 'move': '2 2'})
+    assert response['error'] == "Эта клетка уже занята! Выберите другую."
+    response = server.handle({'command': 'state', 'session': [session]})
+    assert response['error'] == "Партия не найдена"